@@ -0,0 +1,91 @@
+"""
+approvals.py
+
+The approval workflow of tickets.
+
+A ticket with an ``approved_by`` user waits for that user's decision:
+``approval_status`` is 'pending' until they approve or reject it, then
+'approved' or 'rejected' with the time in ``approval_decided_at``. Setting
+or changing ``approved_by`` puts the ticket back to 'pending'; clearing it
+clears the status.
+
+An approver's queue is read from the partial index ix_tickets_pending_approval
+(approved_by, approval_status, id) over pending tickets only, in pages keyed
+on the last ticket id, so fetching a page costs the same whatever the
+position in the queue and however many tickets were decided before.
+"""
+from sqlalchemy import event, func, inspect, select
+
+from db import db
+from models import ActivityLogModel, TicketModel
+
+APPROVAL_PENDING = "pending"
+APPROVAL_APPROVED = "approved"
+APPROVAL_REJECTED = "rejected"
+
+# Decision in the API -> approval_status
+DECISIONS = {"approve": APPROVAL_APPROVED, "reject": APPROVAL_REJECTED}
+
+
+def pending_approvals(approver_id, after=None, limit=50):
+    """One page of the tickets waiting for ``approver_id``, oldest first.
+
+    Returns (tickets, last id of the page or None if there is no next page).
+    """
+    query = TicketModel.query.filter(
+        TicketModel.approved_by == approver_id,
+        TicketModel.approval_status == APPROVAL_PENDING,
+    )
+    if after is not None:
+        query = query.filter(TicketModel.id > after)
+    # One extra row tells whether there is a next page
+    tickets = query.order_by(TicketModel.id).limit(limit + 1).all()
+    last_id = tickets[limit - 1].id if len(tickets) > limit else None
+    return tickets[:limit], last_id
+
+
+def decide_approvals(approver_id, ticket_ids, decision, reason=None):
+    """Approve or reject ``ticket_ids`` on behalf of ``approver_id`` in the current transaction.
+
+    Returns (decided tickets, ids that are not pending for this approver). If
+    any id is not, nothing is changed so the batch applies all or nothing.
+    """
+    ticket_ids = sorted(set(ticket_ids))
+    tickets = (
+        TicketModel.query.filter(
+            TicketModel.id.in_(ticket_ids),
+            TicketModel.approved_by == approver_id,
+            TicketModel.approval_status == APPROVAL_PENDING,
+        )
+        .order_by(TicketModel.id)
+        .with_for_update()
+        .all()
+    )
+    found = {ticket.id for ticket in tickets}
+    rejected_ids = [ticket_id for ticket_id in ticket_ids if ticket_id not in found]
+    if rejected_ids:
+        return [], rejected_ids
+
+    status = DECISIONS[decision]
+    now = db.session.execute(select(func.current_timestamp())).scalar()
+    action = f"Ticket {status}" + (f": {reason}" if reason else "")
+    for ticket in tickets:
+        ticket.approval_status = status
+        ticket.approval_decided_at = now
+        db.session.add(ActivityLogModel(ticket_id=ticket.id, user_id=approver_id, action=action[:200]))
+    return tickets, []
+
+
+def _approver_changed(ticket):
+    return inspect(ticket).attrs.approved_by.history.has_changes()
+
+
+@event.listens_for(db.session, "before_flush")
+def update_approval_state(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, TicketModel) and obj.approval_status is None and obj.approved_by is not None:
+            obj.approval_status = APPROVAL_PENDING
+    for obj in session.dirty:
+        if isinstance(obj, TicketModel) and _approver_changed(obj):
+            obj.approval_status = APPROVAL_PENDING if obj.approved_by is not None else None
+            obj.approval_decided_at = None
@@ -0,0 +1,107 @@
+"""
+archives.py
+
+Zip archives streamed while they are built.
+
+``stream_zip`` yields the archive in chunks as it reads the member files
+from attachment storage, so neither the archive nor a temporary file ever
+exists in full: memory use is bounded by the read chunk size, whatever the
+size of the bundle. Members are
+written with data descriptors and ZIP64 records where needed, which zipfile
+does by itself when the output stream is not seekable.
+
+Files that are already compressed (images, office documents, archives, ...)
+are stored as they are; deflating them again costs CPU for no gain.
+"""
+import io
+import logging
+import os
+import time
+import zipfile
+
+from storage import StorageError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+COMPRESSED_EXTENSIONS = {
+    ".7z", ".avi", ".bz2", ".docx", ".gif", ".gz", ".heic", ".jpeg", ".jpg", ".m4a", ".mkv", ".mov", ".mp3",
+    ".mp4", ".odt", ".ods", ".pdf", ".png", ".pptx", ".rar", ".tgz", ".webm", ".webp", ".xlsx", ".xz", ".zip",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable stream collecting what zipfile writes."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(names):
+    """Make archive member names unique: 'a.txt', 'a (2).txt', ..."""
+    seen = set()
+    result = []
+    for name in names:
+        base, extension = os.path.splitext(name)
+        candidate, counter = name, 1
+        while candidate in seen:
+            counter += 1
+            candidate = f"{base} ({counter}){extension}"
+        seen.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def stream_zip(storage, entries):
+    """Yield a zip archive of ``entries``, a list of (storage key, member name) pairs.
+
+    Entries whose file is missing or unreadable are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for key, name in entries:
+            stat = storage.stat(key)
+            try:
+                if stat is None:
+                    raise StorageError("file not found")
+                source = storage.open(key)
+            except StorageError as e:
+                logger.warning(f"Skipping {key} in archive: {e}")
+                continue
+
+            size, modified = stat
+            with source:
+                member = zipfile.ZipInfo(name, date_time=time.localtime(modified)[:6])
+                member.file_size = size  # Lets zipfile decide on ZIP64 up front
+                if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+                    member.compress_type = zipfile.ZIP_STORED
+                else:
+                    member.compress_type = zipfile.ZIP_DEFLATED
+
+                with archive.open(member, "w") as target:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            # The data descriptor is written when the member is closed
+            yield sink.drain()
+    # Closing the archive wrote the central directory
+    yield sink.drain()
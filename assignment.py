@@ -0,0 +1,235 @@
+"""
+assignment.py
+
+Automatic assignment of new tickets, and the workload index it relies on.
+
+``WorkloadIndex`` keeps, per process, the agents (users whose role is in
+ASSIGNMENT_ROLES) and their number of open tickets, in total and per
+category. It is built from one aggregate query over open tickets and one
+over users, then kept current incrementally: each commit of this process
+that creates, (re)assigns, re-categorises, closes, reopens or deletes a
+ticket adjusts the counts. Changes made by other workers are picked up by a
+rebuild every ASSIGNMENT_REBUILD_SECONDS. Choosing an assignee never queries
+the tickets table.
+
+Strategies (ASSIGNMENT_STRATEGY) for tickets created without assigned_to:
+
+- ``round_robin``: agents in turn.
+- ``least_loaded``: the agent with the fewest open tickets.
+- ``category_skill``: the least loaded of the agents with a config_master
+  'skill' for the ticket's category; everyone if nobody has it.
+"""
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, or_, select
+
+from config_index import WILDCARD, get_config_index
+from db import db
+from models import TicketModel, UserModel
+
+STRATEGIES = ("none", "round_robin", "least_loaded", "category_skill")
+
+
+class WorkloadIndex:
+    """Open tickets per agent, in total and per category."""
+
+    def __init__(self, roles, closed_statuses, rebuild_interval):
+        self.roles = roles
+        self.closed_statuses = closed_statuses
+        self.rebuild_interval = rebuild_interval
+        self.agents = {}
+        self.open_tickets = {}
+        self.open_by_category = {}
+        self._next = 0
+        self._built_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._stale = True
+
+    def _fresh(self):
+        return not self._stale and time.monotonic() - self._built_at < self.rebuild_interval
+
+    def refresh(self):
+        """Rebuild the index if it is stale or older than the rebuild interval."""
+        if self._fresh():
+            return self
+        agents = dict(
+            db.session.execute(
+                select(UserModel.id, UserModel.username)
+                .where(UserModel.role.in_(self.roles))
+                .order_by(UserModel.id)
+            ).all()
+        )
+        rows = db.session.execute(
+            select(TicketModel.assigned_to, TicketModel.category, func.count())
+            .where(
+                TicketModel.assigned_to.is_not(None),
+                or_(TicketModel.status.is_(None), TicketModel.status.not_in(self.closed_statuses)),
+            )
+            .group_by(TicketModel.assigned_to, TicketModel.category)
+        ).all()
+
+        open_tickets = {}
+        open_by_category = {}
+        for user_id, category, count in rows:
+            open_tickets[user_id] = open_tickets.get(user_id, 0) + count
+            key = (user_id, category or WILDCARD)
+            open_by_category[key] = open_by_category.get(key, 0) + count
+
+        with self._lock:
+            self.agents, self.open_tickets, self.open_by_category = agents, open_tickets, open_by_category
+            self._built_at = time.monotonic()
+            self._stale = False
+        return self
+
+    def apply(self, deltas):
+        """Add {(user id, category): change in open tickets} from a commit."""
+        with self._lock:
+            for (user_id, category), delta in deltas.items():
+                self.open_tickets[user_id] = self.open_tickets.get(user_id, 0) + delta
+                key = (user_id, category)
+                self.open_by_category[key] = self.open_by_category.get(key, 0) + delta
+
+    def choose(self, strategy, category, skills):
+        """The id of the agent to assign a new ticket of ``category`` to, or None."""
+        with self._lock:
+            agents = list(self.agents)
+            if not agents:
+                return None
+            if strategy == "round_robin":
+                user_id = agents[self._next % len(agents)]
+                self._next += 1
+                return user_id
+
+            candidates = agents
+            if strategy == "category_skill":
+                skilled = skills.get(category, ())
+                candidates = [user_id for user_id in agents if self.agents[user_id] in skilled] or agents
+            return min(candidates, key=lambda user_id: (self.open_tickets.get(user_id, 0), user_id))
+
+    def workload(self):
+        """Open tickets of every agent, for dispatchers."""
+        with self._lock:
+            categories = {}
+            for (user_id, category), count in self.open_by_category.items():
+                if count:
+                    categories.setdefault(user_id, {})[category] = count
+            return [
+                {
+                    "user_id": user_id,
+                    "username": username,
+                    "open_tickets": self.open_tickets.get(user_id, 0),
+                    "categories": categories.get(user_id, {}),
+                }
+                for user_id, username in self.agents.items()
+            ]
+
+
+def init_assignment(app):
+    strategy = app.config["ASSIGNMENT_STRATEGY"]
+    if strategy not in STRATEGIES:
+        raise RuntimeError(f"Unknown ASSIGNMENT_STRATEGY '{strategy}'.")
+    app.extensions["workload_index"] = WorkloadIndex(
+        app.config["ASSIGNMENT_ROLES"],
+        app.config["TICKET_CLOSED_STATUSES"],
+        app.config["ASSIGNMENT_REBUILD_SECONDS"],
+    )
+
+
+def get_workload_index():
+    """The up-to-date workload index of the current app."""
+    return current_app.extensions["workload_index"].refresh()
+
+
+def choose_assignee(ticket_data):
+    """The agent a new ticket should be assigned to under ASSIGNMENT_STRATEGY, or None."""
+    strategy = current_app.config["ASSIGNMENT_STRATEGY"]
+    if strategy == "none":
+        return None
+    config_index = get_config_index()
+    skills = config_index.skills if config_index is not None else {}
+    return get_workload_index().choose(strategy, ticket_data.get("category") or WILDCARD, skills)
+
+
+def _open_load(assignee, category, status, closed_statuses):
+    """The (assignee, category) a ticket counts towards, or None if it counts for nobody."""
+    if assignee is None or status in closed_statuses:
+        return None
+    return assignee, category or WILDCARD
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    """Nothing to do: listening with active history is what makes SQLAlchemy load ``oldvalue``."""
+
+
+# Setting one of these on an expired ticket (e.g. after a commit) would otherwise leave no
+# previous value in the attribute history, and _values could not tell which load it leaves
+for _attribute in (TicketModel.assigned_to, TicketModel.category, TicketModel.status):
+    event.listen(_attribute, "set", _load_previous_value, active_history=True)
+
+
+def _values(ticket, previous):
+    state = inspect(ticket)
+    values = []
+    for name in ("assigned_to", "category", "status"):
+        attr = state.attrs[name]
+        if previous and attr.history.has_changes():
+            deleted = attr.history.deleted
+            values.append(deleted[0] if deleted else None)
+        else:
+            values.append(attr.value)
+    return values
+
+
+@event.listens_for(db.session, "after_flush")
+def track_workload_changes(session, flush_context):
+    if not has_app_context() or "workload_index" not in current_app.extensions:
+        return
+    closed_statuses = current_app.config["TICKET_CLOSED_STATUSES"]
+    deltas = session.info.setdefault("workload_deltas", {})
+
+    def add(key, delta):
+        if key is not None:
+            deltas[key] = deltas.get(key, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, TicketModel):
+            add(_open_load(*_values(obj, previous=False), closed_statuses), 1)
+        elif isinstance(obj, UserModel):
+            session.info["agents_changed"] = True
+    for obj in session.dirty:
+        if isinstance(obj, TicketModel) and session.is_modified(obj):
+            add(_open_load(*_values(obj, previous=True), closed_statuses), -1)
+            add(_open_load(*_values(obj, previous=False), closed_statuses), 1)
+        elif isinstance(obj, UserModel) and session.is_modified(obj):
+            session.info["agents_changed"] = True
+    for obj in session.deleted:
+        if isinstance(obj, TicketModel):
+            add(_open_load(*_values(obj, previous=True), closed_statuses), -1)
+        elif isinstance(obj, UserModel):
+            session.info["agents_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def apply_workload_changes(session):
+    deltas = session.info.pop("workload_deltas", None)
+    agents_changed = session.info.pop("agents_changed", False)
+    if not has_app_context():
+        return
+    index = current_app.extensions.get("workload_index")
+    if index is None:
+        return
+    if agents_changed:
+        index.invalidate()
+    elif deltas:
+        index.apply({key: delta for key, delta in deltas.items() if delta})
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def discard_workload_changes(session, previous_transaction):
+    session.info.pop("workload_deltas", None)
+    session.info.pop("agents_changed", None)
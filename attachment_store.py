@@ -0,0 +1,170 @@
+"""
+attachment_store.py
+
+Storage keys of attachment files, and the sweeper that keeps the stored
+files and the attachments table in step.
+
+Each upload is stored under the key UPLOAD_FOLDER/<ticket_id>/<random>/<name>
+of the storage backend (see storage.py), so two files with the same name
+never overwrite each other and a failed request can delete exactly the files
+it wrote.
+
+The sweeper removes what interrupted uploads leave behind: attachment rows
+still pointing at the '/' placeholder of the two-step upload, and files (or
+previews) no attachment row refers to. Both must be older than
+ATTACHMENT_ORPHAN_SECONDS, so uploads that are still in flight are kept.
+Only files whose key has the shape ``upload_key`` gives are swept; anything
+else below UPLOAD_FOLDER (files placed there by hand, keys of the old upload
+flow, dotfiles) is never deleted by the sweeper. It
+runs every ATTACHMENT_SWEEP_INTERVAL seconds in a background thread started
+by the first request, and on demand with ``flask sweep-attachments``.
+"""
+import logging
+import re
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import click
+from sqlalchemy import func, select
+from werkzeug.utils import secure_filename
+
+from db import db, writing
+from models import AttachmentModel
+from previews import PREVIEW_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# filepath of an attachment row whose file was never uploaded
+PLACEHOLDER_PATH = "/"
+
+# The part of an upload_key after UPLOAD_FOLDER: <ticket_id>/<random>/<name>
+UPLOAD_KEY_PATTERN = re.compile(r"\d+/[0-9a-f]{32}/[^/.][^/]*")
+
+
+def upload_key(upload_folder, ticket_id, filename):
+    """A new, unique storage key for an uploaded file of ``ticket_id``."""
+    name = secure_filename(filename) or "file"
+    return "/".join((upload_folder.strip("/"), str(ticket_id), uuid.uuid4().hex, name))
+
+
+def is_upload_key(upload_folder, key):
+    """Whether ``key``, or the attachment ``key`` is the preview of, was named by ``upload_key``."""
+    if key.endswith(PREVIEW_SUFFIX):
+        key = key[: -len(PREVIEW_SUFFIX)]
+    prefix = upload_folder.strip("/") + "/"
+    return key.startswith(prefix) and UPLOAD_KEY_PATTERN.fullmatch(key[len(prefix):]) is not None
+
+
+def is_shared(key, attachment_id):
+    """Whether an attachment other than ``attachment_id`` stores its file under ``key``.
+
+    Rows of the old two-step upload flow can share a path; their file must
+    outlive each of them but the last.
+    """
+    other = db.session.execute(
+        select(AttachmentModel.id)
+        .where(AttachmentModel.filepath == key, AttachmentModel.id != attachment_id)
+        .limit(1)
+    ).first()
+    return other is not None
+
+
+def discard_files(storage, keys):
+    """Best-effort removal of files written by a request that failed."""
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove {key} after a failed upload: {e}")
+
+
+def sweep_attachments(app):
+    """Removes orphaned attachment rows and files; returns (rows, files) removed."""
+    grace = app.config["ATTACHMENT_ORPHAN_SECONDS"]
+    storage = app.extensions["storage"]
+
+    with app.app_context():
+        now = db.session.execute(select(func.current_timestamp())).scalar()
+        orphaned = (
+            AttachmentModel.filepath == PLACEHOLDER_PATH,
+            AttachmentModel.uploaded_at < now - timedelta(seconds=grace),
+        )
+        # Only take the write lock when there is something to delete
+        found = db.session.execute(select(AttachmentModel.id).where(*orphaned).limit(1)).first()
+        db.session.commit()
+        orphans = []
+        if found is not None:
+            with writing():
+                orphans = AttachmentModel.query.filter(*orphaned).all()
+                for attachment in orphans:
+                    db.session.delete(attachment)
+                db.session.commit()
+
+        referenced = set(
+            db.session.execute(
+                select(AttachmentModel.filepath).where(AttachmentModel.filepath != PLACEHOLDER_PATH)
+            ).scalars()
+        )
+        db.session.remove()
+
+    removed_files = 0
+    cutoff = time.time() - grace
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    # Listed up front: deleting while a listing is in progress can skip entries
+    candidates = [
+        key for key, modified in storage.iter_keys(upload_folder)
+        if modified < cutoff and is_upload_key(upload_folder, key)
+    ]
+    for key in candidates:
+        owner = key[: -len(PREVIEW_SUFFIX)] if key.endswith(PREVIEW_SUFFIX) else key
+        if owner in referenced:
+            continue
+        try:
+            storage.delete(key)
+            removed_files += 1
+        except Exception as e:
+            logger.warning(f"Could not remove orphaned upload {key}: {e}")
+
+    if orphans or removed_files:
+        logger.info(f"Attachment sweep removed {len(orphans)} rows and {removed_files} files.")
+    return len(orphans), removed_files
+
+
+def _sweep_forever(app):
+    interval = app.config["ATTACHMENT_SWEEP_INTERVAL"]
+    while True:
+        time.sleep(interval)
+        try:
+            sweep_attachments(app)
+        except Exception as e:
+            logger.error(f"Attachment sweep failed: {e}")
+
+
+def init_attachment_sweeper(app):
+    """Registers the sweep command and the periodic sweep of ``app``."""
+
+    @app.cli.command("sweep-attachments")
+    def sweep_attachments_command():
+        """Remove orphaned attachment rows and upload files."""
+        rows, files = sweep_attachments(app)
+        click.echo(f"Removed {rows} orphaned attachment rows and {files} unreferenced files.")
+
+    if app.config["ATTACHMENT_SWEEP_INTERVAL"] <= 0:
+        return
+
+    lock = threading.Lock()
+    started = []
+
+    @app.before_request
+    def start_attachment_sweeper():
+        # Started from the first request so CLI commands never spawn the thread
+        if started:
+            return
+        with lock:
+            if not started:
+                threading.Thread(
+                    target=_sweep_forever, args=(app,), name="attachment-sweeper", daemon=True
+                ).start()
+                started.append(True)
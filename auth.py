@@ -0,0 +1,66 @@
+"""
+auth.py
+
+Resolution of the authenticated user behind a JWT.
+
+The JWT identity is the username. Resolving it to a user on every request
+would cost a query, so ``load_user`` keeps a small TTL/LRU cache per app of
+the fields handlers need (id, role, approver flag). Entries are dropped when
+a user is updated or deleted through the API; other workers see the change
+once their entry expires (USER_CACHE_TTL seconds).
+"""
+import threading
+from collections import namedtuple
+
+from cachetools import TTLCache
+from flask import current_app
+
+from models import UserModel
+
+CurrentUser = namedtuple("CurrentUser", ["id", "username", "role", "approver"])
+
+_lock = threading.Lock()
+
+
+def init_auth(app):
+    """Creates the user cache of ``app``, sized by USER_CACHE_SIZE and USER_CACHE_TTL."""
+    app.extensions["user_cache"] = TTLCache(maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"])
+
+
+def _get_cache():
+    return current_app.extensions["user_cache"]
+
+
+def load_user(username):
+    """Return the ``CurrentUser`` for ``username``, or None if it does not exist."""
+    cache = _get_cache()
+    with _lock:
+        user = cache.get(username)
+    if user is not None:
+        return user
+
+    row = (
+        UserModel.query.with_entities(UserModel.id, UserModel.username, UserModel.role, UserModel.approver)
+        .filter_by(username=username)
+        .first()
+    )
+    if row is None:
+        return None
+
+    user = CurrentUser(row.id, row.username, row.role, bool(row.approver))
+    with _lock:
+        cache[username] = user
+    return user
+
+
+def invalidate_user(*usernames):
+    """Drop cached entries, e.g. after a user is updated or deleted."""
+    cache = _get_cache()
+    with _lock:
+        for username in usernames:
+            cache.pop(username, None)
+
+
+def user_claims(user):
+    """Additional JWT claims describing ``user``, set at login."""
+    return {"user_id": user.id, "role": user.role, "approver": bool(user.approver)}
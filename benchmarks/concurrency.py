@@ -0,0 +1,187 @@
+"""
+Throughput of gunicorn in each SERVER_MODE under concurrent clients.
+
+Starts a local SMTP stub that answers every message after SMTP_DELAY seconds
+(standing in for a remote mail server), then, for each mode, runs gunicorn
+with gunicorn.conf.py on a fresh SQLite file database and sends requests from
+concurrent clients to an endpoint waiting on the network (POST /mail/send)
+and to a CPU-bound one (GET /ticket). Prints requests per second and the
+median and 95th percentile latency:
+
+    python benchmarks/concurrency.py [clients] [requests]
+"""
+import json
+import os
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("sync", "async")
+WORKERS = 2
+PORT = 5099
+SMTP_DELAY = 0.2
+USERNAME = "bench@example.com"
+PASSWORD = "bench"
+
+
+class SlowSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib, accepting each message after SMTP_DELAY seconds."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost stub")
+        for line in self.rfile:
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("HELO", "EHLO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                time.sleep(SMTP_DELAY)
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def setup(path):
+    """Creates the database at ``path`` with a user and a few tickets."""
+    import logging
+
+    from passlib.hash import pbkdf2_sha256
+
+    from app import create_app
+    from db import db
+    from models import TicketModel, UserModel
+
+    logging.disable(logging.CRITICAL)
+    app = create_app(f"sqlite:///{path}")
+    with app.app_context():
+        db.create_all()
+        db.session.add(UserModel(username=USERNAME, password=pbkdf2_sha256.hash(PASSWORD), role="admin"))
+        db.session.flush()
+        for number in range(100):
+            db.session.add(TicketModel(title=f"Ticket {number}", description="d" * 100, status="open",
+                                       priority="low", created_by=1))
+        db.session.commit()
+
+
+def call(method, path, body=None, token=None):
+    """(HTTP status, seconds) of one request to the server under test."""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f"http://127.0.0.1:{PORT}{path}", data=data, headers=headers, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def wait_for_server(process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited before serving requests.")
+        try:
+            socket.create_connection(("127.0.0.1", PORT), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start.")
+
+
+def load(method, path, body, token, clients, requests):
+    """(requests per second, p50 seconds, p95 seconds, failed requests) of ``requests`` calls."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(lambda _: call(method, path, body, token), range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(seconds for _, seconds in results)
+    failed = sum(1 for status, _ in results if status >= 400)
+    return requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], failed
+
+
+def run(mode, path, smtp_port, clients, requests):
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        DATABASE_URL=f"sqlite:///{path}",
+        GUNICORN_BIND=f"127.0.0.1:{PORT}",
+        GUNICORN_WORKERS=str(WORKERS),
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(smtp_port),
+        SLA_CHECK_INTERVAL="0",
+        RATELIMIT_BACKEND="none",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(process)
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{PORT}/login", data=json.dumps({"username": USERNAME, "password": PASSWORD}).encode(),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        with urllib.request.urlopen(request) as response:
+            token = json.load(response)["access_token"]
+        mail = {"subject": "Benchmark", "recipients": ["someone@example.com"], "body": "Hello"}
+        return {
+            "POST /mail/send": load("POST", "/mail/send", mail, token, clients, requests),
+            "GET /ticket": load("GET", "/ticket", None, token, clients, requests),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    smtp = SMTPStub(("127.0.0.1", 0), SlowSMTPHandler)
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    print(f"{WORKERS} workers, {clients} clients, {requests} requests per endpoint, "
+          f"SMTP answering after {SMTP_DELAY * 1000:.0f} ms")
+    try:
+        for mode in MODES:
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, "bench.db")
+                setup(path)
+                for endpoint, (rate, p50, p95, failed) in run(mode, path, smtp.server_address[1],
+                                                              clients, requests).items():
+                    print(f"  {mode:<6} {endpoint:<16} {rate:7.1f} req/s  p50 {p50 * 1000:6.0f} ms  "
+                          f"p95 {p95 * 1000:6.0f} ms  {failed} failed")
+    finally:
+        smtp.shutdown()
+
+
+if __name__ == "__main__":
+    main()
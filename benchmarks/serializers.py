@@ -0,0 +1,94 @@
+"""
+List serialization: marshmallow against the compiled serializers.
+
+Fills an in-memory database with tickets, comments and activity logs, then
+times dumping and JSON-encoding every row of each list endpoint's schema both
+ways: ``Schema(many=True).dump`` encoded by flask's JSON provider (what
+``@blp.response`` does), and ``serializers.compile_schema`` encoded by
+``serializers.dumps`` (what ``serializers.dump_response`` does). Both outputs
+are checked to decode to the same data first.
+
+    python benchmarks/serializers.py [tickets]
+"""
+import json
+import logging
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 20
+# Comments and activity logs per ticket
+CHILDREN = 3
+
+
+def populate(tickets):
+    from db import db
+    from models import ActivityLogModel, CommentModel, TicketModel, UserModel
+
+    db.create_all()
+    for number in range(USERS):
+        db.session.add(UserModel(username=f"user{number}@example.com", password="x", role="agent"))
+    db.session.flush()
+    for number in range(tickets):
+        ticket = TicketModel(
+            title=f"Ticket {number}", description="d" * 100, status="open", priority="high",
+            created_by=1 + number % USERS, assigned_to=1 + (number + 1) % USERS,
+        )
+        db.session.add(ticket)
+        db.session.flush()
+        for child in range(CHILDREN):
+            db.session.add(CommentModel(ticket_id=ticket.id, user_id=1 + child, content="c" * 50))
+            db.session.add(ActivityLogModel(ticket_id=ticket.id, user_id=1 + child, action="updated"))
+    db.session.commit()
+
+
+def best_of(func, repeat=5):
+    """The fastest of ``repeat`` calls of ``func``, in seconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    tickets = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    from flask import json as flask_json
+    from sqlalchemy.orm import selectinload
+
+    from app import create_app
+    from models import ActivityLogModel, CommentModel, TicketModel
+    from schemas import ActivityLogSchema, CommentSchema, TicketSchema
+    from serializers import compile_schema, dumps
+
+    logging.disable(logging.CRITICAL)
+    os.environ["SLA_CHECK_INTERVAL"] = "0"
+    app = create_app("sqlite://")
+    with app.app_context():
+        populate(tickets)
+        cases = (
+            (TicketSchema, TicketModel.query.options(selectinload("*")).all()),
+            (CommentSchema, CommentModel.query.all()),
+            (ActivityLogSchema, ActivityLogModel.query.all()),
+        )
+        print(f"{tickets} tickets, {CHILDREN} comments and activity logs each")
+        for schema_class, objs in cases:
+            schema = schema_class(many=True)
+            dump = compile_schema(schema_class)
+
+            def marshmallow():
+                return flask_json.dumps(schema.dump(objs))
+
+            def compiled():
+                return dumps([dump(obj) for obj in objs])
+
+            if json.loads(marshmallow()) != json.loads(compiled()):
+                raise SystemExit(f"{schema_class.__name__}: compiled output differs from marshmallow")
+            before = best_of(marshmallow)
+            after = best_of(compiled)
+            print(f"  {schema_class.__name__:<18} {len(objs):5} rows  marshmallow {before * 1000:7.1f} ms  "
+                  f"compiled {after * 1000:7.1f} ms  {before / after:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
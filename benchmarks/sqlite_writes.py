@@ -0,0 +1,146 @@
+"""
+Concurrent write throughput of the app on an on-disk SQLite database.
+
+Writer processes commit read-then-insert transactions the way write requests
+do (a count of the ticket's comments, then a new comment). Poller processes
+stand for background pollers like the events poller: outside any request,
+they read the newest comment id every POLL_INTERVAL seconds. Prints, for each
+mode, commits per second, the slowest poller tick and the number of
+"database is locked" failures:
+
+- ``plain``: no SQLite tuning (create_app without db.configure_sqlite).
+- ``tuned``: db.configure_sqlite; writers begin IMMEDIATE, pollers deferred.
+- ``tuned-locking-pollers``: as tuned, but pollers also begin IMMEDIATE, as
+  every transaction outside a request did before db.writing existed.
+
+    python benchmarks/sqlite_writes.py [writers] [pollers] [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("plain", "tuned", "tuned-locking-pollers")
+
+# Seconds between the ticks of a poller; a fixed rate keeps the pollers' CPU use the same in every mode
+POLL_INTERVAL = 0.02
+
+
+def make_app(path, mode):
+    import logging
+
+    import app as app_module
+
+    logging.disable(logging.CRITICAL)
+    if mode == "plain":
+        app_module.configure_sqlite = lambda app: None
+    os.environ["SLA_CHECK_INTERVAL"] = "0"
+    os.environ["RATELIMIT_BACKEND"] = "none"
+    return app_module.create_app(f"sqlite:///{path}")
+
+
+def setup(path, mode):
+    from db import db
+    from models import TicketModel, UserModel
+
+    app = make_app(path, mode)
+    with app.app_context():
+        db.create_all()
+        db.session.add(UserModel(username="bench@example.com", password="x", role="admin"))
+        db.session.flush()
+        db.session.add(TicketModel(title="Bench", description="Bench", status="open", priority="low", created_by=1))
+        db.session.commit()
+
+
+def writer(path, mode, start, deadline, results):
+    from sqlalchemy import func, select
+
+    from db import db, writing
+    from models import CommentModel
+
+    app = make_app(path, mode)
+    time.sleep(max(0.0, start - time.time()))
+    commits = failures = 0
+    with app.app_context(), writing():
+        while time.time() < deadline:
+            try:
+                db.session.execute(select(func.count(CommentModel.id)).where(CommentModel.ticket_id == 1)).scalar()
+                db.session.add(CommentModel(ticket_id=1, user_id=1, content="bench"))
+                db.session.commit()
+                commits += 1
+            except Exception as e:
+                db.session.rollback()
+                if "locked" not in str(e):
+                    raise
+                failures += 1
+    results.put((commits, 0.0, failures))
+
+
+def poller(path, mode, start, deadline, results):
+    from sqlalchemy import func, select
+
+    from db import db, writing
+    from models import CommentModel
+
+    app = make_app(path, mode)
+    time.sleep(max(0.0, start - time.time()))
+    slowest = 0.0
+    failures = 0
+    with app.app_context():
+        while time.time() < deadline:
+            tick = time.perf_counter()
+            try:
+                if mode == "tuned-locking-pollers":
+                    with writing():
+                        db.session.execute(select(func.max(CommentModel.id))).scalar()
+                else:
+                    db.session.execute(select(func.max(CommentModel.id))).scalar()
+                db.session.commit()
+                slowest = max(slowest, time.perf_counter() - tick)
+            except Exception as e:
+                db.session.rollback()
+                if "locked" not in str(e):
+                    raise
+                failures += 1
+            time.sleep(POLL_INTERVAL)
+    results.put((0, slowest, failures))
+
+
+def run(mode, writers, pollers, seconds):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.db")
+        setup(path, mode)
+        results = multiprocessing.Queue()
+        start = time.time() + 3  # Every process has created its app by then
+        deadline = start + seconds
+        processes = [multiprocessing.Process(target=writer, args=(path, mode, start, deadline, results))
+                     for _ in range(writers)]
+        processes += [multiprocessing.Process(target=poller, args=(path, mode, start, deadline, results))
+                      for _ in range(pollers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    commits = sum(result[0] for result in totals)
+    slowest = max(result[1] for result in totals)
+    failures = sum(result[2] for result in totals)
+    return commits / seconds, slowest, failures
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pollers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(f"{writers} writers, {pollers} pollers, {seconds:g}s per mode")
+    for mode in MODES:
+        rate, slowest, failures = run(mode, writers, pollers, seconds)
+        print(f"  {mode:<22} {rate:8.0f} commits/s  slowest poll {slowest * 1000:6.1f} ms  {failures} locked failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Startup time of a worker: importing app.py and calling create_app().
+
+Each run is a fresh interpreter, like a container cold start or a gunicorn
+worker recycle. Prints the median of the runs and the slowest modules
+imported by app.py (from python -X importtime).
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints the seconds spent importing app and creating the app
+SCRIPT = """
+import time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app("sqlite://")
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def measure():
+    """(import seconds, create_app seconds) in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    import_seconds, create_seconds = output.split()[-2:]
+    return float(import_seconds), float(create_seconds)
+
+
+def slowest_imports(count=10):
+    """[(cumulative microseconds, module)] of the slowest modules imported by app.py."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app('sqlite://')"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level; keep those made by app.py itself
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth == 1:
+            imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [measure() for _ in range(runs)]
+    import_seconds = statistics.median(result[0] for result in results)
+    create_seconds = statistics.median(result[1] for result in results)
+    print(f"import app: {import_seconds:.3f}s  create_app: {create_seconds:.3f}s  "
+          f"total: {import_seconds + create_seconds:.3f}s  (median of {runs})")
+    print("slowest imports:")
+    for cumulative, module in slowest_imports():
+        print(f"  {cumulative / 1e6:.3f}s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+config_index.py
+
+In-process index of the config_master table.
+
+Holds a type -> values map and a parent -> children adjacency so ticket
+validation and the /configmaster/tree endpoint never scan the table, plus
+the SLA policies (see sla.py) and agent skills (see assignment.py). The
+index is rebuilt lazily: immediately after this process commits a config
+change, and when a cheap fingerprint query (run at most every
+CONFIG_INDEX_CHECK_SECONDS) shows another worker changed the table.
+"""
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+
+from db import db
+from models import ConfigMasterModel
+
+# Value accepted for category/subcategory without a config entry (the model default)
+WILDCARD = "ALL"
+
+# config_master type of SLA policies: value '<priority>' or '<priority>:<category>', label = hours until due
+SLA_TYPE = "sla"
+
+# config_master type of agent skills: value = category, label = username of an agent handling it
+SKILL_TYPE = "skill"
+
+
+class ConfigIndex:
+    """Lookup tables built from all config_master rows."""
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self.values = {}
+        self.children = {}
+        self.child_values = {}
+        self.roots = {}
+        self.sla_hours = {}
+        self.skills = {}
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._stale = True
+
+    def refresh(self):
+        """Rebuild the index if config_master changed since the last build."""
+        now = time.monotonic()
+        if not self._stale and now - self._checked_at < self.check_interval:
+            return self
+        with self._lock:
+            fingerprint = db.session.execute(
+                select(
+                    func.count(ConfigMasterModel.id),
+                    func.max(ConfigMasterModel.id),
+                    # Every update bumps a row's version, even within the same second
+                    func.sum(ConfigMasterModel.version),
+                )
+            ).one()
+            if self._stale or tuple(fingerprint) != self._fingerprint:
+                # Plain rows rather than ORM objects, which would expire with the session
+                configs = db.session.execute(
+                    select(
+                        ConfigMasterModel.id,
+                        ConfigMasterModel.type,
+                        ConfigMasterModel.value,
+                        ConfigMasterModel.label,
+                        ConfigMasterModel.color,
+                        ConfigMasterModel.parent,
+                    ).order_by(ConfigMasterModel.id)
+                ).all()
+                self._build(configs)
+                self._fingerprint = tuple(fingerprint)
+            self._checked_at = now
+            self._stale = False
+        return self
+
+    def _build(self, configs):
+        values = {}
+        children = {}
+        roots = {}
+        for config in configs:
+            values.setdefault(config.type, set()).add(config.value)
+            if config.parent:
+                children.setdefault(config.parent, []).append(config)
+            else:
+                roots.setdefault(config.type, []).append(config)
+        self.child_values = {parent: {child.value for child in configs} for parent, configs in children.items()}
+        self.sla_hours = _sla_policies(roots.get(SLA_TYPE, ()))
+        skills = {}
+        for config in roots.get(SKILL_TYPE, ()):
+            skills.setdefault(config.value, set()).add(config.label)
+        self.skills = skills
+        self.values, self.children, self.roots = values, children, roots
+
+    def is_valid(self, config_type, value):
+        """True if ``value`` is configured for ``config_type``, or the type has no entries."""
+        allowed = self.values.get(config_type)
+        return not allowed or value in allowed
+
+    def is_child(self, parent, value):
+        """True if ``value`` is configured under ``parent``."""
+        return value in self.child_values.get(parent, ())
+
+    def due_hours(self, priority, category):
+        """Hours a ticket may stay open under its SLA policy, or None without a policy.
+
+        A policy for the priority and category wins over the priority-wide one.
+        """
+        hours = self.sla_hours.get((priority, category))
+        if hours is None:
+            hours = self.sla_hours.get((priority, WILDCARD))
+        return hours
+
+    def tree(self):
+        """Root entries per type, each with their nested children."""
+        return {
+            config_type: [self._node(config, set()) for config in configs]
+            for config_type, configs in self.roots.items()
+        }
+
+    def _node(self, config, seen):
+        # ``seen`` guards against parent cycles in the free-form parent column
+        seen = seen | {config.value}
+        return {
+            "id": config.id,
+            "type": config.type,
+            "value": config.value,
+            "label": config.label,
+            "color": config.color,
+            "children": [
+                self._node(child, seen) for child in self.children.get(config.value, ()) if child.value not in seen
+            ],
+        }
+
+
+def _sla_policies(configs):
+    policies = {}
+    for config in configs:
+        priority, _, category = config.value.partition(":")
+        try:
+            hours = float(config.label)
+        except ValueError:
+            continue  # Not a number of hours; ignored rather than failing every ticket write
+        if hours > 0:
+            policies[(priority, category or WILDCARD)] = hours
+    return policies
+
+
+def init_config_index(app):
+    app.extensions["config_index"] = ConfigIndex(app.config["CONFIG_INDEX_CHECK_SECONDS"])
+
+
+def get_config_index():
+    """The up-to-date index of the current app, or None outside an app context."""
+    if not has_app_context() or "config_index" not in current_app.extensions:
+        return None
+    return current_app.extensions["config_index"].refresh()
+
+
+def validate_ticket_config(data, current_category=None):
+    """Return {field: [message]} for ticket fields not allowed by config_master.
+
+    ``current_category`` is the stored category of the ticket being updated;
+    a subcategory sent without a category must belong to it.
+    """
+    index = get_config_index()
+    if index is None:
+        return {}
+
+    errors = {}
+    for field in ("status", "priority", "category"):
+        value = data.get(field)
+        if value is not None and value != WILDCARD and not index.is_valid(field, value):
+            errors[field] = [f"Unknown {field} '{value}'."]
+
+    subcategory = data.get("subcategory")
+    category = data.get("category", current_category)
+    if subcategory is not None and subcategory != WILDCARD:
+        if category is not None and category != WILDCARD and index.values.get("subcategory"):
+            if not index.is_child(category, subcategory):
+                errors["subcategory"] = [f"Subcategory '{subcategory}' does not belong to category '{category}'."]
+        elif not index.is_valid("subcategory", subcategory):
+            errors["subcategory"] = [f"Unknown subcategory '{subcategory}'."]
+    return errors
+
+
+@event.listens_for(db.session, "after_flush")
+def track_config_changes(session, flush_context):
+    if any(isinstance(obj, ConfigMasterModel) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["config_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_config_index(session):
+    if session.info.pop("config_changed", False) and has_app_context():
+        index = current_app.extensions.get("config_index")
+        if index is not None:
+            index.invalidate()
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def discard_config_changes(session, previous_transaction):
+    session.info.pop("config_changed", None)
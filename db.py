@@ -1,3 +1,158 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from cachetools import TTLCache
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Requests that never write; their transactions can start as plain deferred reads
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Cookie telling any worker that this client wrote recently, see pin_to_primary
+PRIMARY_PIN_COOKIE = "primary_pin"
+
+# Guards the per-app TTLCache of users pinned to the primary by this process
+_pin_lock = threading.Lock()
+
+
+def _request_identity():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:  # JWT not verified (yet) in this request
+        return None
+
+
+def use_replica():
+    """Whether the current request may read from a replica."""
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return False
+    if not current_app.config.get("REPLICA_BIND_KEYS"):
+        return False
+    if PRIMARY_PIN_COOKIE in request.cookies:
+        return False
+    identity = _request_identity()
+    if identity is None:
+        return True
+    with _pin_lock:
+        return identity not in current_app.extensions["replica_pins"]
+
+
+class RoutingSession(Session):
+    """Session sending the reads of safe requests to a read replica.
+
+    Writes, flushes and anything outside a GET/HEAD/OPTIONS request use the
+    primary. A client that wrote in the last REPLICA_PIN_SECONDS also reads
+    from the primary so it sees its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_replica():
+            if "replica_bind_key" not in g:
+                g.replica_bind_key = random.choice(current_app.config["REPLICA_BIND_KEYS"])
+            return self._db.engines[g.replica_bind_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def configure_replicas(app):
+    """Routes safe reads to the replica binds listed in REPLICA_BIND_KEYS."""
+    pin_seconds = app.config["REPLICA_PIN_SECONDS"]
+    app.extensions["replica_pins"] = TTLCache(maxsize=10000, ttl=pin_seconds)
+
+    @app.after_request
+    def pin_to_primary(response):
+        if request.method in READ_ONLY_METHODS or response.status_code >= 400:
+            return response
+        identity = _request_identity()
+        if identity is not None:
+            with _pin_lock:
+                current_app.extensions["replica_pins"][identity] = True
+        # The cookie carries the pin to the other workers
+        response.set_cookie(PRIMARY_PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax")
+        return response
+
+
+@contextmanager
+def writing():
+    """Declares that the code in this block writes to the database.
+
+    Outside requests, SQLite transactions begun inside the block start with
+    BEGIN IMMEDIATE (see configure_sqlite). Begin the block before the
+    transaction's first query: background jobs that mostly read should check
+    for work in a plain transaction, commit it, then write in this block.
+    """
+    previous = g.get("db_writing", False)
+    g.db_writing = True
+    try:
+        yield
+    finally:
+        g.db_writing = previous
+
+
+def _writes():
+    """Whether transactions begun now are expected to write."""
+    if has_request_context():
+        return request.method not in READ_ONLY_METHODS
+    return has_app_context() and g.get("db_writing", False)
+
+
+def configure_sqlite(app):
+    """Tunes the SQLite engine of ``app`` for concurrent workers.
+
+    Every connection runs in WAL mode (readers no longer block the writer) with
+    synchronous=NORMAL, a busy timeout, mmap and a larger page cache.
+
+    Transactions of write requests, and of other code inside a ``writing()``
+    block, start with BEGIN IMMEDIATE, which takes the database's single write
+    lock up front. Writers from all workers therefore
+    queue on that lock (waiting up to the busy timeout) instead of failing with
+    "database is locked" when a deferred transaction tries to upgrade. If the
+    lock still cannot be taken, BEGIN is retried a bounded number of times with
+    backoff; nothing has run in the transaction yet, so this is always safe.
+    Everything else, including the read-only ticks of background pollers,
+    begins a deferred transaction and never competes with writers for the lock.
+    """
+    config = app.config
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT_MS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+        "cache_size": config["SQLITE_CACHE_SIZE"],
+    }
+    retries = config["SQLITE_WRITE_RETRIES"]
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Disable pysqlite's own BEGIN handling; the "begin" hook below emits it
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin_sqlite_transaction(conn):
+        if not _writes():
+            conn.exec_driver_sql("BEGIN")
+            return
 
-db = SQLAlchemy()
+        for attempt in range(retries + 1):
+            try:
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                return
+            except OperationalError as e:
+                if "locked" not in str(e) or attempt == retries:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
@@ -0,0 +1,264 @@
+"""
+events.py
+
+Live ticket events for the SSE stream.
+
+Every flush that creates, updates or deletes a ticket, or adds a comment, is
+turned into small JSON events. Each worker process keeps an ``EventBroker``
+that fans those events out to its connected SSE clients. How an event reaches
+the brokers depends on EVENTS_BACKEND:
+
+- ``local``: published to this process' broker after the commit. Only correct
+  with a single worker process.
+- ``postgres``: sent with ``pg_notify`` inside the writing transaction, so it
+  is delivered on commit only; every worker LISTENs and feeds its own broker.
+- ``poll``: written to the ``events`` table inside the writing transaction;
+  every worker polls the table for new rows. Used for SQLite. The writers
+  prune rows older than EVENTS_RETENTION_SECONDS as they insert, so the table
+  stays small even when no worker polls it.
+
+Listener threads are only started when the first client subscribes, so CLI
+commands such as ``flask db upgrade`` never spawn them.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, inspect, text
+from sqlalchemy import select as sa_select
+
+from db import db
+from models import CommentModel, EventModel, TicketModel
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "ticket_events"
+
+
+class EventBroker:
+    """In-process fan-out of events to subscriber queues."""
+
+    def __init__(self, app, backend, queue_size=100):
+        self.app = app
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pruned_at = 0.0
+
+    def subscribe(self):
+        """Returns a queue receiving every event published from now on."""
+        self._ensure_listener()
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # A stalled client loses events; it can catch up via /ticket/changes
+                pass
+
+    def prune_due(self, retention):
+        """Whether the events table should be pruned now; true at most once per ``retention`` seconds."""
+        with self._lock:
+            if time.monotonic() - self._pruned_at < retention:
+                return False
+            self._pruned_at = time.monotonic()
+            return True
+
+    def _ensure_listener(self):
+        if self.backend == "local":
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            target = self._listen_postgres if self.backend == "postgres" else self._poll_table
+            self._listener = threading.Thread(target=target, name="event-listener", daemon=True)
+            self._listener.start()
+
+    def _listen_postgres(self):
+        """Feeds the broker from Postgres LISTEN, reconnecting on errors."""
+        while True:
+            try:
+                with self.app.app_context():
+                    connection = db.engine.raw_connection()
+                try:
+                    pg_connection = connection.driver_connection
+                    pg_connection.autocommit = True
+                    with pg_connection.cursor() as cursor:
+                        cursor.execute(f"LISTEN {NOTIFY_CHANNEL};")
+                    while True:
+                        if select.select([pg_connection], [], [], 5) == ([], [], []):
+                            continue
+                        pg_connection.poll()
+                        while pg_connection.notifies:
+                            notification = pg_connection.notifies.pop(0)
+                            self.publish(json.loads(notification.payload))
+                finally:
+                    connection.close()
+            except Exception as e:
+                logger.error(f"Event listener lost its connection: {e}")
+                time.sleep(1)
+
+    def _poll_table(self):
+        """Feeds the broker from new rows of the events table."""
+        interval = self.app.config["EVENTS_POLL_INTERVAL"]
+        last_id = None
+        while True:
+            try:
+                with self.app.app_context():
+                    if last_id is None:
+                        last_id = db.session.execute(sa_select(func.max(EventModel.id))).scalar() or 0
+                    rows = db.session.execute(
+                        sa_select(EventModel.id, EventModel.payload)
+                        .where(EventModel.id > last_id)
+                        .order_by(EventModel.id)
+                    ).all()
+                    for event_id, payload in rows:
+                        last_id = event_id
+                        self.publish(json.loads(payload))
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Event poller failed: {e}")
+            time.sleep(interval)
+
+
+def init_events(app):
+    """Creates the process-wide broker for ``app``."""
+    backend = app.config.get("EVENTS_BACKEND")
+    if not backend:
+        uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        if uri.startswith("postgresql"):
+            backend = "postgres"
+        elif uri.startswith("sqlite"):
+            backend = "poll"
+        else:
+            backend = "local"
+    app.config.setdefault("EVENTS_POLL_INTERVAL", 1)
+    app.config.setdefault("EVENTS_RETENTION_SECONDS", 300)
+    app.extensions["events"] = EventBroker(app, backend)
+
+
+def get_broker():
+    return current_app.extensions["events"]
+
+
+def ticket_event(event_type, ticket):
+    return {
+        "type": event_type,
+        "ticket_id": ticket.id,
+        "status": ticket.status,
+        "assigned_to": ticket.assigned_to,
+    }
+
+
+def comment_event(session, comment):
+    # Comments are created by ticket_id, so the relationship is usually unset
+    ticket = comment.ticket or session.get(TicketModel, comment.ticket_id)
+    return {
+        "type": "comment.created",
+        "ticket_id": comment.ticket_id,
+        "comment_id": comment.id,
+        "user_id": comment.user_id,
+        "status": ticket.status if ticket else None,
+        "assigned_to": ticket.assigned_to if ticket else None,
+    }
+
+
+def collect_events(session):
+    """Builds the events for the pending changes of ``session``."""
+    events = []
+    for obj in session.new:
+        if isinstance(obj, TicketModel):
+            events.append(ticket_event("ticket.created", obj))
+        elif isinstance(obj, CommentModel):
+            events.append(comment_event(session, obj))
+    for obj in session.dirty:
+        if isinstance(obj, TicketModel) and session.is_modified(obj):
+            attrs = inspect(obj).attrs
+            if attrs.escalated_at.history.has_changes() and obj.escalated_at is not None:
+                event_type = "ticket.escalated"  # Set by the SLA scheduler, see sla.py
+            elif attrs.approval_decided_at.history.has_changes() and obj.approval_decided_at is not None:
+                event_type = f"ticket.{obj.approval_status}"  # ticket.approved or ticket.rejected, see approvals.py
+            elif attrs.assigned_to.history.has_changes():
+                event_type = "ticket.assigned"
+            else:
+                event_type = "ticket.updated"
+            events.append(ticket_event(event_type, obj))
+    for obj in session.deleted:
+        if isinstance(obj, TicketModel):
+            events.append(ticket_event("ticket.deleted", obj))
+    return events
+
+
+def prune_events(session, retention):
+    """Deletes the rows of the events table older than ``retention`` seconds.
+
+    Runs in the writing transaction that inserts events, so the table stays
+    bounded whether or not any worker polls it for a stream subscriber.
+    Pollers only read rows newer than the last one they saw, and a few
+    seconds of retention cover their interval.
+    """
+    now = session.execute(sa_select(func.current_timestamp())).scalar()
+    # Always keep the newest row: SQLite reuses ids once the table is empty
+    newest = sa_select(func.max(EventModel.id)).scalar_subquery()
+    session.execute(
+        delete(EventModel).where(
+            EventModel.created_at < now - timedelta(seconds=retention),
+            EventModel.id < newest,
+        )
+    )
+
+
+@event.listens_for(db.session, "after_flush")
+def queue_events(session, flush_context):
+    if not has_app_context() or "events" not in current_app.extensions:
+        return
+    events = collect_events(session)
+    if not events:
+        return
+
+    backend = get_broker().backend
+    if backend == "postgres":
+        for payload in events:
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": NOTIFY_CHANNEL, "payload": json.dumps(payload)},
+            )
+    elif backend == "poll":
+        session.execute(insert(EventModel), [{"payload": json.dumps(payload)} for payload in events])
+        retention = current_app.config["EVENTS_RETENTION_SECONDS"]
+        if get_broker().prune_due(retention):
+            prune_events(session, retention)
+    else:
+        session.info.setdefault("pending_events", []).extend(events)
+
+
+@event.listens_for(db.session, "after_commit")
+def publish_events(session):
+    events = session.info.pop("pending_events", None)
+    if events and has_app_context():
+        broker = get_broker()
+        for payload in events:
+            broker.publish(payload)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def discard_events(session, previous_transaction):
+    session.info.pop("pending_events", None)
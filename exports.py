@@ -0,0 +1,260 @@
+"""
+exports.py
+
+Bulk export of tickets, comments and activity logs for reporting.
+
+Each table is read with a server-side cursor in batches of EXPORT_BATCH_SIZE
+rows and written out flat, one file per table and month of creation, to the
+attachment storage backend (see storage.py):
+
+    EXPORT_FOLDER/<table>/month=2026-10/<run id>.parquet
+
+Files are Parquet when pyarrow is installed and gzipped CSV otherwise
+(EXPORT_FORMAT forces either). The 'deleted' table lists the rows deleted
+since the previous run, from the tombstones table.
+
+Runs are incremental: EXPORT_FOLDER/_state.json keeps a cursor on the
+indexed updated_at columns, and the next run only exports rows changed
+since. Like /ticket/changes, the cursor trails the database clock by
+CHANGES_OVERLAP_SECONDS, so a row may appear in two runs; consumers keep the
+row from the latest run. ``flask export-tickets --full`` exports everything.
+
+Only one export runs at a time per process. The guard is not shared between
+workers or hosts, so start exports from one place (the CLI from cron, or
+POST /export on a single instance); two concurrent runs would each write
+their files and the later one would overwrite _state.json.
+
+pyarrow takes a while to import, so it is only loaded when Parquet files are
+written; startup only checks that it is installed.
+"""
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import Boolean, DateTime, Integer, func, select
+
+from db import db
+from models import ActivityLogModel, CommentModel, TicketModel, TombstoneModel
+from storage import StorageError
+
+logger = logging.getLogger(__name__)
+
+# Exported name -> (model, column rows are selected on for incremental runs, column partitioned by month)
+EXPORT_TABLES = {
+    "tickets": (TicketModel, TicketModel.updated_at, TicketModel.created_at),
+    "comments": (CommentModel, CommentModel.updated_at, CommentModel.created_at),
+    "activity_logs": (ActivityLogModel, ActivityLogModel.updated_at, ActivityLogModel.created_at),
+    "deleted": (TombstoneModel, TombstoneModel.deleted_at, TombstoneModel.deleted_at),
+}
+
+STATE_FILE = "_state.json"
+
+# Only one export at a time in this process (not across workers, see above)
+_running = threading.Lock()
+
+
+def _has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def export_format(configured):
+    """The output format for EXPORT_FORMAT ('auto', 'parquet' or 'csv')."""
+    if configured == "auto":
+        return "parquet" if _has_pyarrow() else "csv"
+    if configured == "parquet" and not _has_pyarrow():
+        raise RuntimeError("EXPORT_FORMAT 'parquet' requires pyarrow.")
+    if configured not in ("parquet", "csv"):
+        raise RuntimeError(f"Unknown EXPORT_FORMAT '{configured}'.")
+    return configured
+
+
+def _arrow_type(column):
+    import pyarrow
+
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp("us")
+    return pyarrow.string()
+
+
+class _ParquetPartition:
+    extension = "parquet"
+
+    def __init__(self, path, columns):
+        import pyarrow.parquet
+
+        self.schema = pyarrow.schema([(column.name, _arrow_type(column)) for column in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        import pyarrow
+
+        values = list(zip(*rows))
+        arrays = [pyarrow.array(column, type=field.type) for column, field in zip(values, self.schema)]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvPartition:
+    extension = "csv.gz"
+
+    def __init__(self, path, columns):
+        self.file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([column.name for column in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def _month(value):
+    return value.strftime("%Y-%m") if value is not None else "unknown"
+
+
+def load_export_state(storage, folder):
+    """The state saved by the last export run, or None if there was none."""
+    key = f"{folder}/{STATE_FILE}"
+    if storage.stat(key) is None:
+        return None
+    try:
+        with storage.open(key) as source:
+            return json.loads(source.read())
+    except (StorageError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable export state {key}: {e}")
+        return None
+
+
+def export_table(storage, folder, name, run_id, since, file_format, batch_size, workdir):
+    """Write the rows of one table changed since ``since`` (all if None); returns (rows, keys)."""
+    model, changed_column, month_column = EXPORT_TABLES[name]
+    columns = list(model.__table__.columns)
+    month_index = [column.name for column in columns].index(month_column.key)
+    partition_class = _ParquetPartition if file_format == "parquet" else _CsvPartition
+
+    query = select(*columns).order_by(model.id)
+    if since is not None:
+        query = query.where(changed_column >= since)
+
+    partitions = {}
+    exported = 0
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for batch in result.partitions():
+        by_month = {}
+        for row in batch:
+            by_month.setdefault(_month(row[month_index]), []).append(tuple(row))
+        for month, rows in by_month.items():
+            if month not in partitions:
+                path = os.path.join(workdir, f"{name}-{month}.{partition_class.extension}")
+                partitions[month] = (path, partition_class(path, columns))
+            partitions[month][1].write(rows)
+        exported += len(batch)
+
+    keys = []
+    for month, (path, partition) in sorted(partitions.items()):
+        partition.close()
+        key = f"{folder}/{name}/month={month}/{run_id}.{partition_class.extension}"
+        with open(path, "rb") as source:
+            storage.save(key, source)
+        keys.append(key)
+    return exported, keys
+
+
+def _export(app, full):
+    storage = app.extensions["storage"]
+    folder = app.config["EXPORT_FOLDER"].strip("/")
+    file_format = export_format(app.config["EXPORT_FORMAT"])
+    overlap = timedelta(seconds=app.config["CHANGES_OVERLAP_SECONDS"])
+
+    previous = None if full else load_export_state(storage, folder)
+    since = datetime.fromisoformat(previous["cursor"]) if previous else None
+
+    workdir = tempfile.mkdtemp(prefix="export-")
+    with app.app_context():
+        try:
+            # Naive like the DateTime columns
+            now = db.session.execute(select(func.current_timestamp())).scalar().replace(tzinfo=None)
+            run_id = now.strftime("%Y%m%dT%H%M%S")
+            rows, files = {}, []
+            for name in EXPORT_TABLES:
+                rows[name], keys = export_table(
+                    storage, folder, name, run_id, since, file_format, app.config["EXPORT_BATCH_SIZE"], workdir
+                )
+                files += keys
+        finally:
+            db.session.remove()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    state = {
+        "run_id": run_id,
+        "format": file_format,
+        "full": since is None,
+        "since": since.isoformat() if since else None,
+        "cursor": (now - overlap).isoformat(),
+        "rows": rows,
+        "files": files,
+    }
+    storage.save(f"{folder}/{STATE_FILE}", io.BytesIO(json.dumps(state, indent=2).encode()))
+    logger.info(f"Export {run_id} wrote {sum(rows.values())} rows to {len(files)} files.")
+    return state
+
+
+def run_export(app, full=False):
+    """Export the rows changed since the last run (or all with ``full``); returns the new state."""
+    if not _running.acquire(blocking=False):
+        raise RuntimeError("An export is already running.")
+    try:
+        return _export(app, full)
+    finally:
+        _running.release()
+
+
+def export_running():
+    return _running.locked()
+
+
+def start_export(app, full=False):
+    """Run an export in a background thread; False if one is already running."""
+    if not _running.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            _export(app, full)
+        except Exception as e:
+            logger.error(f"Export failed: {e}")
+        finally:
+            _running.release()
+
+    threading.Thread(target=run, name="export", daemon=True).start()
+    return True
+
+
+def init_exports(app):
+    """Registers the export command of ``app``."""
+    export_format(app.config["EXPORT_FORMAT"])
+
+    @app.cli.command("export-tickets")
+    @click.option("--full", is_flag=True, help="Export every row instead of the changes since the last run.")
+    def export_tickets_command(full):
+        """Export tickets, comments and activity logs for reporting."""
+        state = run_export(app, full)
+        for name, count in state["rows"].items():
+            click.echo(f"{name}: {count} rows")
+        click.echo(f"Wrote {len(state['files'])} {state['format']} files.")
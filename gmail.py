@@ -0,0 +1,283 @@
+"""
+gmail.py
+
+Sending mail through the Gmail API as a long-lived service.
+
+Building a Gmail client parses the discovery document, and delegated
+service account credentials fetch an access token on first use, so
+``GmailSender`` does both once per process instead of once per message:
+
+- the service account key is read once, and the delegated credentials of
+  every sender address are cached and reused until their token expires;
+- one client is built from the discovery document shipped with
+  google-api-python-client, and its requests are sent over a pool of
+  keep-alive HTTP connections;
+- ``send_many`` sends up to GMAIL_BATCH_SIZE messages of a sender per HTTP
+  batch request.
+
+GMAIL_TRANSPORT 'fake' swaps Google for ``FakeGmailTransport``, which
+answers like the Gmail API and keeps the messages it was sent, so sending can
+be exercised offline. The Google client libraries are slow to import, so
+they are only loaded when the first message is sent.
+"""
+import base64
+import email
+import json
+import logging
+import threading
+import urllib.parse
+from email.message import EmailMessage
+
+from cachetools import LRUCache
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+SEND_SCOPE = "https://www.googleapis.com/auth/gmail.send"
+TRANSPORTS = ("google", "fake")
+
+# Delegated credentials kept, one per sender address
+CREDENTIALS_CACHE_SIZE = 256
+
+
+def create_message(sender_email, to_email, subject, message_text):
+    """The Gmail API body of an email message."""
+    message = EmailMessage()
+    message.set_content(message_text)
+    message["To"] = to_email
+    message["From"] = sender_email
+    message["Subject"] = subject
+    return {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
+
+class HttpPool:
+    """Reusable HTTP transports; each keeps its connections to Google open between requests.
+
+    A transport serves one request at a time, so concurrent sends each take
+    their own, and up to ``size`` idle ones are kept.
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.factory()
+
+    def release(self, http):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(http)
+
+
+def _google_http():
+    import httplib2
+
+    return httplib2.Http(timeout=30)
+
+
+class GmailSender:
+    """Sends messages through the Gmail API, as any address of the domain (delegation)."""
+
+    def __init__(self, service_account_file=None, http_factory=None, pool_size=10, batch_size=50):
+        """Without ``service_account_file``, requests are not authenticated (for fake transports)."""
+        self.service_account_file = service_account_file
+        self.batch_size = batch_size
+        self.pool = HttpPool(http_factory or _google_http, pool_size)
+        self._service = None
+        self._base_credentials = None
+        self._credentials = LRUCache(maxsize=CREDENTIALS_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _get_service(self):
+        if self._service is None:
+            from googleapiclient.discovery import build
+
+            with self._lock:
+                if self._service is None:
+                    http = self.pool.acquire()
+                    try:
+                        # Each request is sent with the http of its sender, see _authorized
+                        self._service = build("gmail", "v1", http=http, cache_discovery=False, static_discovery=True)
+                    finally:
+                        self.pool.release(http)
+        return self._service
+
+    def _get_credentials(self, sender_email):
+        """The cached credentials of ``sender_email``; their token is reused until it expires."""
+        from google.auth.credentials import AnonymousCredentials
+
+        with self._lock:
+            credentials = self._credentials.get(sender_email)
+            if credentials is None:
+                if self.service_account_file is None:
+                    credentials = AnonymousCredentials()
+                else:
+                    if self._base_credentials is None:
+                        from google.oauth2 import service_account
+
+                        self._base_credentials = service_account.Credentials.from_service_account_file(
+                            self.service_account_file, scopes=[SEND_SCOPE]
+                        )
+                    credentials = self._base_credentials.with_subject(sender_email)
+                self._credentials[sender_email] = credentials
+        return credentials
+
+    def _authorized(self, sender_email, http):
+        """``http`` authenticated as ``sender_email``; the token is only fetched when it expired."""
+        from google_auth_httplib2 import AuthorizedHttp, Request
+
+        credentials = self._get_credentials(sender_email)
+        if not credentials.valid:
+            with self._refresh_lock:
+                if not credentials.valid:
+                    credentials.refresh(Request(http))
+        return AuthorizedHttp(credentials, http=http)
+
+    def _send_request(self, message):
+        return self._get_service().users().messages().send(userId="me", body=message)
+
+    def send(self, sender_email, to_email, subject, message_text):
+        """Send one message; returns its Gmail message id."""
+        http = self.pool.acquire()
+        try:
+            authorized = self._authorized(sender_email, http)
+            request = self._send_request(create_message(sender_email, to_email, subject, message_text))
+            return request.execute(http=authorized)["id"]
+        finally:
+            self.pool.release(http)
+
+    def send_many(self, messages):
+        """Send (sender, to, subject, text) tuples in batch requests, one sender per batch.
+
+        Returns, in the order of ``messages``, the Gmail message id of each or
+        the exception that made it fail.
+        """
+        messages = list(messages)
+        results = [None] * len(messages)
+        by_sender = {}
+        for position, message in enumerate(messages):
+            by_sender.setdefault(message[0], []).append(position)
+
+        for sender_email, positions in by_sender.items():
+            for start in range(0, len(positions), self.batch_size):
+                chunk = positions[start:start + self.batch_size]
+                try:
+                    self._send_batch(sender_email, [(position, messages[position]) for position in chunk], results)
+                except Exception as e:
+                    logger.error(f"Batch of {len(chunk)} messages from {sender_email} failed: {e}")
+                    for position in chunk:
+                        results[position] = e
+        return results
+
+    def _send_batch(self, sender_email, messages, results):
+        def store(request_id, response, exception):
+            results[int(request_id)] = exception if exception is not None else response["id"]
+
+        http = self.pool.acquire()
+        try:
+            authorized = self._authorized(sender_email, http)
+            batch = self._get_service().new_batch_http_request(callback=store)
+            for position, (_, to_email, subject, message_text) in messages:
+                request = self._send_request(create_message(sender_email, to_email, subject, message_text))
+                request.http = authorized  # Authenticates the part as the sender
+                batch.add(request, request_id=str(position))
+            batch.execute(http=authorized)
+        finally:
+            self.pool.release(http)
+
+
+class FakeGmailTransport:
+    """An httplib2.Http stand-in answering like the Gmail API, for sending mail offline.
+
+    Messages sent to it are kept in ``sent`` as parsed email messages;
+    messages to the addresses in ``rejected`` get a 400 error.
+    """
+
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.sent = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        import httplib2
+
+        with self._lock:
+            self.requests += 1
+        if isinstance(body, bytes):
+            body = body.decode()
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        if urllib.parse.urlparse(uri).path.startswith("/batch"):
+            content_type, content = self._batch(body, headers["content-type"])
+            return httplib2.Response({"status": 200, "content-type": content_type}), content.encode()
+        status, payload = self._send(body)
+        return httplib2.Response({"status": status, "content-type": "application/json"}), json.dumps(payload).encode()
+
+    def _send(self, body):
+        message = email.message_from_bytes(base64.urlsafe_b64decode(json.loads(body)["raw"]))
+        if message["To"] in self.rejected:
+            return 400, {"error": {"code": 400, "message": f"Invalid To header: {message['To']}"}}
+        with self._lock:
+            self.sent.append(message)
+            message_id = f"fake-{len(self.sent)}"
+        return 200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+    def _batch(self, body, content_type):
+        parts = email.message_from_string(f"content-type: {content_type}\r\n\r\n{body}").get_payload()
+        boundary = "fake-batch-boundary"
+        lines = []
+        for part in parts:
+            # Each part is an HTTP request: request line and headers, a blank line, then the JSON body
+            request_text = part.get_payload().replace("\r\n", "\n")
+            status, payload = self._send(request_text.partition("\n\n")[2])
+            reason = "OK" if status == 200 else "Bad Request"
+            lines += [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <response-{part['Content-ID'][1:]}",
+                "",
+                f"HTTP/1.1 {status} {reason}",
+                "Content-Type: application/json",
+                "",
+                json.dumps(payload),
+            ]
+        lines.append(f"--{boundary}--")
+        return f"multipart/mixed; boundary={boundary}", "\r\n".join(lines)
+
+
+def init_gmail(app):
+    """Sets up the Gmail sender of ``app``; clients and credentials are created on first use."""
+    transport = app.config["GMAIL_TRANSPORT"]
+    if transport not in TRANSPORTS:
+        raise RuntimeError(f"Unknown GMAIL_TRANSPORT '{transport}'.")
+    if transport == "fake":
+        fake = FakeGmailTransport()
+        sender = GmailSender(http_factory=lambda: fake, batch_size=app.config["GMAIL_BATCH_SIZE"])
+        app.extensions["gmail_fake_transport"] = fake
+    else:
+        sender = GmailSender(
+            app.config["GMAIL_SERVICE_ACCOUNT_FILE"],
+            pool_size=app.config["GMAIL_POOL_SIZE"],
+            batch_size=app.config["GMAIL_BATCH_SIZE"],
+        )
+    app.extensions["gmail_sender"] = sender
+
+
+_default_sender = None
+
+
+def get_gmail_sender():
+    """The Gmail sender of the current app, or one using config/service_account.json outside apps."""
+    global _default_sender
+    if has_app_context() and "gmail_sender" in current_app.extensions:
+        return current_app.extensions["gmail_sender"]
+    if _default_sender is None:
+        _default_sender = GmailSender("config/service_account.json")
+    return _default_sender
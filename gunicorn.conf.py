@@ -0,0 +1,39 @@
+"""
+gunicorn.conf.py
+
+Production server settings, used as ``gunicorn "app:create_app()"``.
+
+SERVER_MODE selects how a worker serves requests:
+
+- ``sync`` (default): one request per worker process at a time.
+- ``async``: gevent workers. Each request runs in a greenlet and yields
+  whenever it waits on the network (database, SMTP, object storage, slow
+  clients of uploads, downloads and /events/stream), so one worker holds up
+  to GUNICORN_WORKER_CONNECTIONS requests at once. Size the database pool
+  with DB_POOL_SIZE / DB_MAX_OVERFLOW accordingly; requests beyond it wait
+  for a connection instead of failing.
+
+GUNICORN_WORKER_CLASS still overrides the worker class chosen by the mode.
+"""
+import os
+
+server_mode = os.getenv("SERVER_MODE", "sync")
+if server_mode not in ("sync", "async"):
+    raise RuntimeError(f"Unknown SERVER_MODE '{server_mode}'.")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent" if server_mode == "async" else "sync")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 2000))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+
+
+def post_fork(server, worker):
+    # psycopg2 blocks the gevent hub unless its wait callback is patched
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed; database calls will block other greenlets.")
+        else:
+            patch_psycopg()
@@ -0,0 +1,166 @@
+"""
+idempotency.py
+
+Idempotency-Key support for endpoints that create things.
+
+Clients on flaky networks retry writes they never saw an answer to. When a
+request carries an ``Idempotency-Key`` header, the ``idempotent`` decorator
+records the key (per user) in the idempotency_keys table before running the
+view and stores the successful response with it afterwards. A retry with
+the same key gets the stored response back, with ``Idempotent-Replayed:
+true``, without running the view again.
+
+- A key reused for a different request (method, path or body) is refused
+  with 422.
+- A retry while the first request is still running gets 409. If that
+  request died without finishing, its key is taken over after
+  IDEMPOTENCY_LOCK_SECONDS.
+- Failed requests (errors, 4xx and 5xx responses) release their key, so
+  the client can retry them.
+
+Keys expire after IDEMPOTENCY_TTL seconds. Expired rows are deleted, at most
+every IDEMPOTENCY_PRUNE_SECONDS, by the request recording a new key; the
+delete is a range scan of the created_at index. The table therefore holds
+about one TTL's worth of keyed writes.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import current_user
+from flask_smorest import abort
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+from models import IdempotencyKeyModel
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+_last_prune = [0.0]
+
+
+def request_fingerprint():
+    """sha256 of what makes two requests the same: method, path and body."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    if request.mimetype == "multipart/form-data":
+        # Hashing the raw body would read every upload into memory; parts and sizes identify it well enough
+        digest.update(repr(sorted(request.form.items(multi=True))).encode())
+        digest.update(repr(sorted((name, part.filename) for name, part in request.files.items(multi=True))).encode())
+        digest.update(str(request.content_length).encode())
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _db_now():
+    # Naive like the DateTime columns
+    return db.session.execute(select(func.current_timestamp())).scalar().replace(tzinfo=None)
+
+
+def _prune(now):
+    if time.monotonic() - _last_prune[0] < current_app.config["IDEMPOTENCY_PRUNE_SECONDS"]:
+        return
+    _last_prune[0] = time.monotonic()
+    expired = now - timedelta(seconds=current_app.config["IDEMPOTENCY_TTL"])
+    result = db.session.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.created_at < expired))
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} expired idempotency keys.")
+
+
+def _claim(key, fingerprint):
+    """Record ``key`` as in progress; returns the stored row if it was already used."""
+    now = _db_now()
+    record = IdempotencyKeyModel.query.filter_by(user_id=current_user.id, key=key).with_for_update().first()
+    if record is not None:
+        expired = record.created_at < now - timedelta(seconds=current_app.config["IDEMPOTENCY_TTL"])
+        abandoned = record.status_code is None and record.created_at < now - timedelta(
+            seconds=current_app.config["IDEMPOTENCY_LOCK_SECONDS"]
+        )
+        if not expired and not abandoned:
+            db.session.rollback()
+            return record
+        db.session.delete(record)
+        db.session.flush()
+
+    _prune(now)
+    db.session.add(IdempotencyKeyModel(user_id=current_user.id, key=key, request_hash=fingerprint, created_at=now))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request with the same key claimed it first
+        db.session.rollback()
+        abort(409, message=f"A request with this {HEADER} is still in progress.")
+    return None
+
+
+def _release(key):
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyKeyModel).where(
+            IdempotencyKeyModel.user_id == current_user.id,
+            IdempotencyKeyModel.key == key,
+            IdempotencyKeyModel.status_code.is_(None),
+        )
+    )
+    db.session.commit()
+
+
+def _replay(record):
+    response = current_app.response_class(record.response_body, status=record.status_code)
+    if record.content_type:
+        response.headers["Content-Type"] = record.content_type
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(func):
+    """Replay the stored response of requests repeating an Idempotency-Key header."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return func(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            abort(400, message=f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long.")
+
+        fingerprint = request_fingerprint()
+        record = _claim(key, fingerprint)
+        if record is not None:
+            if record.request_hash != fingerprint:
+                abort(422, message=f"{HEADER} was already used for a different request.")
+            if record.status_code is None:
+                abort(409, message=f"A request with this {HEADER} is still in progress.")
+            logger.info(f"Replaying the response stored for {HEADER} '{key}' of user ID {current_user.id}.")
+            return _replay(record)
+
+        try:
+            response = current_app.make_response(func(*args, **kwargs))
+        except Exception:
+            _release(key)
+            raise
+        if response.status_code >= 400 or response.is_streamed:
+            _release(key)
+            return response
+
+        db.session.execute(
+            update(IdempotencyKeyModel)
+            .where(IdempotencyKeyModel.user_id == current_user.id, IdempotencyKeyModel.key == key)
+            .values(
+                status_code=response.status_code,
+                content_type=response.content_type,
+                response_body=response.get_data(),
+            )
+        )
+        db.session.commit()
+        return response
+
+    return wrapper
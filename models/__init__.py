@@ -4,4 +4,9 @@ from models.comment import CommentModel
 from models.activity_log import ActivityLogModel
 from models.attachment import AttachmentModel
 from models.config_master import ConfigMasterModel
+from models.tombstone import TombstoneModel
+from models.event import EventModel
 
+from models.idempotency_key import IdempotencyKeyModel
+from models.rate_limit import RateLimitModel
+from models.table_change import TableChangeModel
@@ -9,6 +9,8 @@ class ActivityLogModel(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     action = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(),
+                           index=True)
 
     ticket = db.relationship("TicketModel", back_populates="activity_logs")
     user = db.relationship("UserModel", back_populates="activity_logs")
\ No newline at end of file
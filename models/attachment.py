@@ -9,5 +9,7 @@ class AttachmentModel(db.Model):
     filename = db.Column(db.String(200), nullable=False)
     filepath = db.Column(db.String(500), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(),
+                           index=True)
 
     ticket = db.relationship("TicketModel", back_populates="attachments")
\ No newline at end of file
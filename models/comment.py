@@ -1,14 +1,50 @@
+from sqlalchemy import event, update
+from sqlalchemy.orm import attributes
+
 from db import db
+from models.ticket import TicketModel
 
 
 class CommentModel(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (db.Index("ix_comments_ticket_id_id", "ticket_id", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey("tickets.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(),
+                           index=True)
+    # Optimistic concurrency: bumped by every update, see responses.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
     ticket = db.relationship("TicketModel", back_populates="comments")
-    user = db.relationship("UserModel", back_populates="comments")
\ No newline at end of file
+    user = db.relationship("UserModel", back_populates="comments")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+@event.listens_for(db.session, "after_flush")
+def update_comment_counts(session, flush_context):
+    """Keeps tickets.comment_count in step with the comments added or removed in this flush."""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, CommentModel):
+            deltas[obj.ticket_id] = deltas.get(obj.ticket_id, 0) + 1
+    for obj in session.deleted:
+        if isinstance(obj, CommentModel):
+            deltas[obj.ticket_id] = deltas.get(obj.ticket_id, 0) - 1
+    if not deltas:
+        return
+
+    for ticket_id, delta in deltas.items():
+        session.execute(
+            update(TicketModel)
+            .where(TicketModel.id == ticket_id)
+            .values(comment_count=TicketModel.comment_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+        ticket = session.identity_map.get(session.identity_key(TicketModel, ticket_id))
+        if ticket is not None and "comment_count" in ticket.__dict__:
+            attributes.set_committed_value(ticket, "comment_count", (ticket.comment_count or 0) + delta)
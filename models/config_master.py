@@ -11,3 +11,7 @@ class ConfigMasterModel(db.Model):
     parent = db.Column(db.String(50), nullable=True)   # Optional parent
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    # Optimistic concurrency: bumped by every update, see responses.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
@@ -0,0 +1,9 @@
+from db import db
+
+
+class EventModel(db.Model):
+    __tablename__ = "events"
+
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON encoded event, see events.py
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
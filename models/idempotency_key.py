@@ -0,0 +1,15 @@
+from db import db
+
+
+class IdempotencyKeyModel(db.Model):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body, see idempotency.py
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the first request is in progress
+    content_type = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
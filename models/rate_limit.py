@@ -0,0 +1,10 @@
+from db import db
+
+
+class RateLimitModel(db.Model):
+    __tablename__ = "rate_limits"
+
+    # '<route group>:<caller>', see ratelimit.py
+    key = db.Column(db.String(200), primary_key=True)
+    window_start = db.Column(db.Integer, primary_key=True)  # POSIX timestamp of the fixed window's start
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,37 @@
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import db
+
+
+class TableChangeModel(db.Model):
+    __tablename__ = "table_changes"
+
+    # One row per table, bumped by every flush that inserts, updates or deletes its rows
+    table = db.Column(db.String(50), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _upsert(dialect):
+    if dialect == "postgresql":
+        return postgresql_insert(TableChangeModel)
+    if dialect == "sqlite":
+        return sqlite_insert(TableChangeModel)
+    raise RuntimeError(f"Table change counters do not support {dialect}.")
+
+
+@event.listens_for(db.session, "after_flush")
+def count_table_changes(session, flush_context):
+    """Bumps the change counter of every table written by this flush (see responses.table_fingerprint)."""
+    tables = {obj.__tablename__ for obj in session.new} | {obj.__tablename__ for obj in session.deleted}
+    tables.update(obj.__tablename__ for obj in session.dirty if session.is_modified(obj))
+    if not tables:
+        return
+
+    statement = _upsert(session.get_bind().dialect.name)
+    statement = statement.on_conflict_do_update(
+        index_elements=["table"], set_={"seq": TableChangeModel.seq + 1}
+    )
+    # In a fixed order, so concurrent writers lock the counter rows without deadlocking
+    session.execute(statement, [{"table": table, "seq": 1} for table in sorted(tables)])
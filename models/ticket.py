@@ -10,11 +10,22 @@ class TicketModel(db.Model):
     priority = db.Column(db.String(20), default='medium')
     category = db.Column(db.String(100), default='ALL')
     subcategory = db.Column(db.String(100), default='ALL')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Maintained in models/comment.py
     created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     assigned_to = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     approved_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, onupdate=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp(),
+                           index=True)
+    # Optimistic concurrency: bumped by every update, see responses.py
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    # SLA, maintained in sla.py: escalate_at is due_at while the ticket is open and not yet escalated, else NULL
+    due_at = db.Column(db.DateTime, nullable=True)
+    escalate_at = db.Column(db.DateTime, nullable=True, index=True)
+    escalated_at = db.Column(db.DateTime, nullable=True)
+    # Approval, maintained in approvals.py: 'pending' until approved_by approves or rejects the ticket
+    approval_status = db.Column(db.String(20), nullable=True)
+    approval_decided_at = db.Column(db.DateTime, nullable=True)
 
     creator = db.relationship("UserModel", back_populates="tickets_created", foreign_keys=[created_by])
     assignee = db.relationship("UserModel", back_populates="tickets_assigned", foreign_keys=[assigned_to])
@@ -22,3 +33,13 @@ class TicketModel(db.Model):
     comments = db.relationship("CommentModel", back_populates="ticket", cascade="all, delete-orphan")
     activity_logs = db.relationship("ActivityLogModel", back_populates="ticket", cascade="all, delete-orphan")
     attachments = db.relationship("AttachmentModel", back_populates="ticket", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # An approver's queue, in id order; partial so decided tickets do not grow it
+        db.Index(
+            "ix_tickets_pending_approval", "approved_by", "approval_status", "id",
+            postgresql_where=db.text("approval_status = 'pending'"),
+            sqlite_where=db.text("approval_status = 'pending'"),
+        ),
+    )
+    __mapper_args__ = {"version_id_col": version}
@@ -0,0 +1,27 @@
+from sqlalchemy import event
+
+from db import db
+
+# Tables whose deletions are recorded for the incremental sync endpoint
+TRACKED_TABLES = ("tickets", "comments", "attachments")
+
+
+class TombstoneModel(db.Model):
+    __tablename__ = "tombstones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # Table name of the deleted row, e.g. 'tickets'
+    entity_id = db.Column(db.Integer, nullable=False)
+    ticket_id = db.Column(db.Integer, nullable=True)   # Owning ticket, for comments and attachments
+    deleted_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+
+
+@event.listens_for(db.session, "before_flush")
+def record_tombstones(session, flush_context, instances):
+    """Adds a tombstone for every tracked row deleted in this flush."""
+    for obj in list(session.deleted):
+        entity = getattr(obj, "__tablename__", None)
+        if entity not in TRACKED_TABLES:
+            continue
+        ticket_id = obj.id if entity == "tickets" else obj.ticket_id
+        session.add(TombstoneModel(entity=entity, entity_id=obj.id, ticket_id=ticket_id))
@@ -0,0 +1,118 @@
+"""
+permissions.py
+
+Declarative authorization of API requests.
+
+Who may call an endpoint is declared per blueprint in BLUEPRINT_RULES, by
+HTTP method ('*' for the others), and a MethodView can override its
+blueprint's rules with a ``permissions`` class attribute keyed by view method:
+
+    @blp.route("/user/<int:user_id>")
+    class User(MethodView):
+        permissions = {"delete": ADMIN, "put": f"{ADMIN}|{SELF}"}
+
+A rule is a '|'-separated list of grants, any of which lets the caller in:
+
+- ``*``: any authenticated user
+- a role name, e.g. ``admin`` or ``agent``
+- ``approver``: users with the approver flag
+- ``self``: the user whose id is the route's ``user_id``
+
+Administrators pass every rule. ``init_permissions`` compiles the rules of
+every route into a table keyed by (endpoint, method). A request's rule is
+checked when flask-jwt-extended verifies its token, against the role,
+approver and user_id claims set at login, so it costs a dict lookup and no
+query. Claims last as long as the token: a changed role applies from the
+user's next login or token refresh. Rules that depend on a row, like owning
+a comment, are checked by the views with ``is_admin`` and ``current_user``.
+"""
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt
+
+ANYONE = "*"
+ADMIN = "admin"
+APPROVER = "approver"
+SELF = "self"
+
+# Blueprint -> {HTTP method or '*': rule}; views may override them with a `permissions` attribute
+BLUEPRINT_RULES = {
+    "ActivityLogs": {"GET": ANYONE, "POST": ANYONE, "*": ADMIN},
+    "Approvals": {"*": APPROVER},
+    "Assignment": {"*": f"{ADMIN}|agent"},
+    "ConfigMaster": {"GET": ANYONE, "*": ADMIN},
+    "Exports": {"*": ADMIN},
+    "Tickets": {"DELETE": ADMIN},
+}
+
+# Methods flask adds to every route, which never reach a view
+IMPLICIT_METHODS = ("HEAD", "OPTIONS")
+
+
+class Rule:
+    """A compiled rule: who may call one method of one endpoint."""
+
+    __slots__ = ("text", "anyone", "roles", "approver", "self")
+
+    def __init__(self, text):
+        grants = {grant.strip() for grant in text.split("|") if grant.strip()}
+        if not grants:
+            raise RuntimeError("Empty permission rule.")
+        self.text = text
+        self.anyone = ANYONE in grants
+        self.approver = APPROVER in grants
+        self.self = SELF in grants
+        self.roles = frozenset(grants - {ANYONE, APPROVER, SELF} | {ADMIN})
+
+    def allows(self, claims, view_args):
+        if self.anyone or claims.get("role") in self.roles:
+            return True
+        if self.approver and claims.get("approver"):
+            return True
+        return self.self and view_args.get("user_id") is not None and view_args["user_id"] == claims.get("user_id")
+
+
+def compile_rules(app):
+    """{(endpoint, method): Rule} for every route of ``app`` whose rule is not ANYONE."""
+    rules = {}
+    table = {}
+    for url_rule in app.url_map.iter_rules():
+        view_class = getattr(app.view_functions[url_rule.endpoint], "view_class", None)
+        overrides = getattr(view_class, "permissions", {})
+        blueprint_rules = BLUEPRINT_RULES.get(url_rule.endpoint.rpartition(".")[0], {})
+        for method in url_rule.methods.difference(IMPLICIT_METHODS):
+            text = overrides.get(method.lower()) or blueprint_rules.get(method) or blueprint_rules.get("*", ANYONE)
+            if text == ANYONE:
+                continue
+            if text not in rules:
+                rules[text] = Rule(text)
+            table[(url_rule.endpoint, method)] = rules[text]
+    return table
+
+
+def init_permissions(app):
+    """Compiles the permission rules of the routes registered on ``app``."""
+    app.extensions["permissions"] = compile_rules(app)
+
+
+def check_permissions(jwt_header, jwt_payload):
+    """Whether the verified token of the current request may call its endpoint."""
+    rule = current_app.extensions["permissions"].get((request.endpoint, request.method))
+    if rule is None or rule.allows(jwt_payload, request.view_args or {}):
+        return True
+    current_app.logger.warning(
+        f"User {jwt_payload.get('sub')} ({jwt_payload.get('role')}) denied {request.method} {request.path}: "
+        f"requires {rule.text}."
+    )
+    return False
+
+
+def permission_denied(jwt_header, jwt_payload):
+    return (
+        jsonify({"description": "You do not have permission to perform this action.", "error": "forbidden"}),
+        403,
+    )
+
+
+def is_admin():
+    """Whether the caller of the current request is an administrator, from its token."""
+    return get_jwt().get("role") == ADMIN
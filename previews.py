@@ -0,0 +1,130 @@
+"""
+previews.py
+
+Background generation of attachment previews.
+
+After an upload, ``schedule_preview`` hands the attachment to a small thread
+pool that stores a JPEG thumbnail next to the original, under the key
+``<key>.preview.jpg`` of the same storage backend. Images are handled with
+Pillow; PDFs get a first-page render when PyMuPDF is installed. Other file
+types, or a missing library, simply produce no preview.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - PyMuPDF is optional
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+PREVIEW_SUFFIX = ".preview.jpg"
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+
+def preview_key(key):
+    """Storage key of the preview of the attachment stored under ``key``."""
+    return key + PREVIEW_SUFFIX
+
+
+def can_preview(key):
+    extension = os.path.splitext(key)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return Image is not None
+    if extension == ".pdf":
+        return Image is not None and fitz is not None
+    return False
+
+
+def generate_preview(storage, key, size):
+    """Store the preview for ``key``; returns its key or None."""
+    if not can_preview(key) or storage.stat(key) is None:
+        return None
+
+    with storage.open(key) as source:
+        data = source.read()
+
+    if key.lower().endswith(".pdf"):
+        with fitz.open(stream=data, filetype="pdf") as document:
+            if document.page_count == 0:
+                return None
+            pixmap = document[0].get_pixmap(dpi=72)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        image = Image.open(io.BytesIO(data))
+
+    with image:
+        image.thumbnail((size, size))
+        preview = io.BytesIO()
+        image.convert("RGB").save(preview, "JPEG", quality=80, optimize=True)
+    preview.seek(0)
+    target = preview_key(key)
+    storage.save(target, preview)
+    return target
+
+
+def _run(storage, key, size):
+    try:
+        generate_preview(storage, key, size)
+        logger.info(f"Preview generated for {key}.")
+    except Exception as e:
+        logger.error(f"Error while generating preview for {key}: {e}")
+
+
+def _executor_class():
+    """A pool of real OS threads, even under gevent's monkey-patching.
+
+    Image decoding is CPU work; run on patched threads (greenlets) it would
+    stall every other request of a gevent worker.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return ThreadPoolExecutor
+    if monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+
+        return NativeThreadPoolExecutor
+    return ThreadPoolExecutor
+
+
+def schedule_preview(app, key):
+    """Queue preview generation for ``key`` on the bounded worker pool.
+
+    Returns False when the file type is not supported or the queue is full.
+    """
+    global _executor, _pending
+    if not can_preview(key):
+        return False
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = _executor_class()(
+                max_workers=app.config["PREVIEW_WORKERS"], thread_name_prefix="preview"
+            )
+            _pending = threading.BoundedSemaphore(app.config["PREVIEW_QUEUE_SIZE"])
+
+    if not _pending.acquire(blocking=False):
+        logger.warning(f"Preview queue is full, skipping {key}.")
+        return False
+    future = _executor.submit(_run, app.extensions["storage"], key, app.config["PREVIEW_SIZE"])
+    # Released from the submitting side's callbacks, which gevent runs in its hub
+    future.add_done_callback(lambda _: _pending.release())
+    return True
+
+
+def remove_preview(storage, key):
+    storage.delete(preview_key(key))
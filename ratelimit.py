@@ -0,0 +1,239 @@
+"""
+ratelimit.py
+
+Per-user, per-route-group rate limits.
+
+Every API request is counted against a limit for its caller (the JWT
+identity, or the client address for anonymous requests) and route group (the
+blueprint: 'Tickets', 'Users', 'Mail', ...). RATELIMIT_RULES sets the limit
+of some groups as 'Group=<requests>/<seconds>', comma separated;
+RATELIMIT_DEFAULT applies to the others. Requests over the limit get 429
+with Retry-After; all limited responses carry the RateLimit-Limit,
+RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers.
+
+Limits use a sliding window counter: the count of the current fixed window
+plus the count of the previous one, weighted by how much of it still
+overlaps the sliding window. It needs two counts per caller and group,
+and unlike a plain fixed window it does not allow twice the limit across a
+window boundary.
+
+RATELIMIT_BACKEND chooses where counts live:
+
+- ``memory``: a dict in this process, a few microseconds per request. Each
+  worker enforces the limit on its own share of the traffic.
+- ``database``: the rate_limits table, shared by all workers. One upsert per
+  request on a separate connection; the previous window's count is cached
+  per process as it no longer changes.
+- ``none``: no limits.
+"""
+import math
+import threading
+import time
+
+from cachetools import LRUCache
+from flask import current_app, g, request
+from flask_jwt_extended import decode_token
+from flask_smorest import abort
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import db
+from models import RateLimitModel
+
+BACKENDS = ("memory", "database", "none")
+
+# Requests that are never limited: CORS preflights and the API docs
+EXEMPT_METHODS = ("OPTIONS",)
+EXEMPT_GROUPS = ("api-docs",)
+
+# Bearer token -> (identity, expiry timestamp) of recently seen valid tokens
+_tokens = LRUCache(maxsize=4096)
+_tokens_lock = threading.Lock()
+
+
+def parse_limit(text):
+    """'120/60' -> (120 requests, 60 seconds)."""
+    count, _, period = text.partition("/")
+    return int(count), int(period or 60)
+
+
+def parse_rules(text):
+    """'Tickets=120/60,Mail=10/60' -> {'Tickets': (120, 60), 'Mail': (10, 60)}."""
+    rules = {}
+    for rule in filter(None, (part.strip() for part in text.split(","))):
+        group, _, limit = rule.partition("=")
+        rules[group.strip()] = parse_limit(limit)
+    return rules
+
+
+def sliding_count(previous, current, elapsed, period):
+    """Requests in the sliding window ending now, from the two fixed windows' counts."""
+    return previous * (period - elapsed) / period + current
+
+
+class MemoryStore:
+    """Window counts of this process only."""
+
+    def __init__(self):
+        self.counts = {}  # key -> [window start, period, previous window count, current window count]
+        self._lock = threading.Lock()
+        self._swept_at = 0
+
+    def hit(self, key, start, period):
+        """Count a request in the window beginning at ``start``; returns (previous count, current count)."""
+        with self._lock:
+            entry = self.counts.get(key)
+            if entry is None or entry[0] < start - period:
+                entry = self.counts[key] = [start, period, 0, 0]
+            elif entry[0] < start:
+                entry[:] = [start, period, entry[3], 0]
+            entry[3] += 1
+            counts = entry[2], entry[3]
+            if start > self._swept_at:
+                self._sweep(start)
+        return counts
+
+    def _sweep(self, now):
+        # Entries whose windows both ended can only ever be reset
+        self.counts = {key: entry for key, entry in self.counts.items() if entry[0] + 2 * entry[1] > now}
+        self._swept_at = now + min((entry[1] for entry in self.counts.values()), default=0)
+
+
+class DatabaseStore:
+    """Window counts in the rate_limits table, shared by every worker."""
+
+    PRUNE_SECONDS = 60
+
+    def __init__(self, max_period):
+        self.max_period = max_period
+        self._previous = {}  # (key, window start) -> count of that finished window
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def _insert(self, dialect):
+        if dialect == "postgresql":
+            return postgresql_insert(RateLimitModel)
+        if dialect == "sqlite":
+            return sqlite_insert(RateLimitModel)
+        raise RuntimeError(f"The database rate limit backend does not support {dialect}.")
+
+    def hit(self, key, start, period):
+        engine = db.engine
+        statement = self._insert(engine.dialect.name).values(key=key, window_start=start, count=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=["key", "window_start"], set_={"count": RateLimitModel.count + 1}
+        ).returning(RateLimitModel.count)
+        # Its own short transaction: counts must persist whatever the request does
+        with engine.begin() as connection:
+            current = connection.execute(statement).scalar()
+            previous = self._previous.get((key, start - period))
+            if previous is None:
+                previous = connection.execute(
+                    select(RateLimitModel.count).where(
+                        RateLimitModel.key == key, RateLimitModel.window_start == start - period
+                    )
+                ).scalar() or 0
+                with self._lock:
+                    self._previous[(key, start - period)] = previous
+            self._prune(connection, start)
+        return previous, current
+
+    def _prune(self, connection, now):
+        if time.monotonic() - self._pruned_at < self.PRUNE_SECONDS:
+            return
+        self._pruned_at = time.monotonic()
+        oldest = now - 2 * self.max_period
+        connection.execute(delete(RateLimitModel).where(RateLimitModel.window_start < oldest))
+        with self._lock:
+            self._previous = {entry: count for entry, count in self._previous.items() if entry[1] >= oldest}
+
+
+class RateLimiter:
+    def __init__(self, store, default, rules):
+        self.store = store
+        self.default = default
+        self.rules = rules
+
+    def limit_for(self, group):
+        return self.rules.get(group, self.default)
+
+    def hit(self, caller, group, now=None):
+        """Count a request; returns (allowed, limit, remaining, seconds until reset, period)."""
+        limit, period = self.limit_for(group)
+        now = time.time() if now is None else now
+        elapsed = now % period
+        start = int(now - elapsed)
+        previous, current = self.store.hit(f"{group}:{caller}", start, period)
+        # The request itself is counted; it is allowed if the window held fewer than `limit` before it
+        used = sliding_count(previous, current, elapsed, period)
+        allowed = used <= limit
+        remaining = max(0, math.floor(limit - used))
+        return allowed, limit, remaining, math.ceil(period - elapsed), period
+
+
+def _caller():
+    """'user:<JWT identity>' for requests with a valid bearer token, else 'ip:<client address>'."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme == "Bearer" and token:
+        # Signatures are checked once per token; later requests with it cost a dict lookup
+        with _tokens_lock:
+            identity, expires = _tokens.get(token, (None, 0))
+        if expires < time.time():
+            try:
+                claims = decode_token(token)
+                identity, expires = claims["sub"], claims.get("exp", math.inf)
+            except Exception:
+                identity = None  # The view rejects the token; count the request per address
+            if identity is not None:
+                with _tokens_lock:
+                    _tokens[token] = (identity, expires)
+        if identity is not None:
+            return f"user:{identity}"
+    return f"ip:{request.remote_addr}"
+
+
+def check_rate_limit():
+    limiter = current_app.extensions.get("rate_limiter")
+    if limiter is None or request.method in EXEMPT_METHODS or request.blueprint is None:
+        return
+    group = request.blueprint.split(".")[-1]
+    if group in EXEMPT_GROUPS:
+        return
+    caller = _caller()
+    allowed, limit, remaining, reset, period = limiter.hit(caller, group)
+    g.rate_limit = (limit, remaining, reset, period)
+    if not allowed:
+        current_app.logger.warning(f"Rate limit of {limit}/{period}s exceeded on {group} by {caller}.")
+        abort(429, message=f"Rate limit exceeded; retry in {reset} seconds.")
+
+
+def add_rate_limit_headers(response):
+    rate_limit = g.get("rate_limit")
+    if rate_limit is None:
+        return response
+    limit, remaining, reset, period = rate_limit
+    response.headers["RateLimit-Limit"] = str(limit)
+    response.headers["RateLimit-Remaining"] = str(remaining)
+    response.headers["RateLimit-Reset"] = str(reset)
+    response.headers["RateLimit-Policy"] = f"{limit};w={period}"
+    if response.status_code == 429:
+        response.headers["Retry-After"] = str(reset)
+    return response
+
+
+def init_rate_limits(app):
+    """Installs the rate limiter of ``app`` as configured by RATELIMIT_*."""
+    backend = app.config["RATELIMIT_BACKEND"]
+    if backend not in BACKENDS:
+        raise RuntimeError(f"Unknown RATELIMIT_BACKEND '{backend}'.")
+    if backend == "none":
+        return
+    default, rules = parse_limit(app.config["RATELIMIT_DEFAULT"]), parse_rules(app.config["RATELIMIT_RULES"])
+    if backend == "memory":
+        store = MemoryStore()
+    else:
+        store = DatabaseStore(max(period for _, period in [default, *rules.values()]))
+    app.extensions["rate_limiter"] = RateLimiter(store, default, rules)
+    app.before_request(check_rate_limit)
+    app.after_request(add_rate_limit_headers)
@@ -2,16 +2,27 @@ from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
 from flask import current_app
 from db import db
-from models import ActivityLogModel
+from models import ActivityLogModel, UserModel, TicketModel
 from schemas import ActivityLogSchema
+from responses import conditional
+from serializers import dump_response
 
 
 blp = Blueprint("ActivityLogs", "activity_logs", description="Operations on activity logs")
 
 
+def activity_log_query():
+    """Activity log query with the nested user and ticket loaded up front."""
+    return ActivityLogModel.query.options(
+        selectinload(ActivityLogModel.user),
+        selectinload(ActivityLogModel.ticket),
+    )
+
+
 @blp.route("/activity-log/<int:log_id>")
 class ActivityLog(MethodView):
     @jwt_required()
@@ -39,6 +50,7 @@ class ActivityLog(MethodView):
             logger.error(f"Error deleting activity log with ID {log_id}: {err}")
             abort(500, message="An error occurred while deleting the activity log.")
 
+    @jwt_required()
     @blp.arguments(ActivityLogSchema)
     @blp.response(200, ActivityLogSchema)
     def put(self, log_data, log_id):
@@ -69,14 +81,15 @@ class ActivityLog(MethodView):
 @blp.route("/activity-log")
 class ActivityLogList(MethodView):
     @jwt_required()
+    @conditional(ActivityLogModel, UserModel, TicketModel)
     @blp.response(200, ActivityLogSchema(many=True))
     def get(self):
         """Get a list of all activity logs"""
         logger = current_app.logger
         logger.info("Fetching all activity logs.")
-        logs = ActivityLogModel.query.all()
+        logs = activity_log_query().all()
         logger.debug(f"Total activity logs fetched: {len(logs)}")
-        return logs
+        return dump_response(ActivityLogSchema, logs)
 
     @jwt_required()
     @blp.arguments(ActivityLogSchema)
@@ -105,11 +118,11 @@ class ActivityLogByUser(MethodView):
         """Get activity logs by user_id"""
         logger = current_app.logger
         logger.info(f"Fetching activity logs for user ID: {user_id}")
-        logs = ActivityLogModel.query.filter_by(user_id=user_id).all()
+        logs = activity_log_query().filter_by(user_id=user_id).all()
         if not logs:
             logger.warning(f"No activity logs found for user ID: {user_id}")
             abort(404, message="No activity logs found for this user.")
-        return logs
+        return dump_response(ActivityLogSchema, logs)
 
 
 @blp.route("/activity-log/ticket/<int:ticket_id>")
@@ -120,8 +133,8 @@ class ActivityLogByTicket(MethodView):
         """Get activity logs by ticket_id"""
         logger = current_app.logger
         logger.info(f"Fetching activity logs for ticket ID: {ticket_id}")
-        logs = ActivityLogModel.query.filter_by(ticket_id=ticket_id).all()
+        logs = activity_log_query().filter_by(ticket_id=ticket_id).all()
         if not logs:
             logger.warning(f"No activity logs found for ticket ID: {ticket_id}")
             abort(404, message="No activity logs found for this ticket.")
-        return logs
+        return dump_response(ActivityLogSchema, logs)
@@ -0,0 +1,83 @@
+import base64
+import binascii
+
+from flask import current_app
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+from flask_jwt_extended import jwt_required, current_user
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+from approvals import decide_approvals, pending_approvals
+from schemas import ApprovalPageQuerySchema, ApprovalPageSchema, ApprovalDecisionSchema, ApprovalTicketSchema
+
+blp = Blueprint("Approvals", "approvals", description="Ticket approval queue")
+
+
+def encode_cursor(ticket_id):
+    """Encode the last ticket ID of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(str(ticket_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor, aborting with 400 if it is malformed."""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, message="Invalid cursor.")
+
+
+@blp.route("/approvals/pending")
+class PendingApprovals(MethodView):
+    @jwt_required()
+    @blp.arguments(ApprovalPageQuerySchema, location="query")
+    @blp.response(200, ApprovalPageSchema)
+    def get(self, page_args):
+        """Get a page of the tickets waiting for the current user's approval
+
+        Oldest first. Pass next_cursor back as cursor for the following page;
+        it is null on the last page.
+        """
+        logger = current_app.logger
+        after = decode_cursor(page_args["cursor"]) if "cursor" in page_args else None
+        try:
+            tickets, last_id = pending_approvals(current_user.id, after, page_args["limit"])
+            logger.info(f"Retrieved {len(tickets)} pending approvals for user ID {current_user.id}.")
+            return {"tickets": tickets, "next_cursor": encode_cursor(last_id) if last_id is not None else None}
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving pending approvals for user ID {current_user.id}: {e}")
+            abort(500, message="An error occurred while retrieving pending approvals.")
+
+
+@blp.route("/approvals/decisions")
+class ApprovalDecisions(MethodView):
+    @jwt_required()
+    @blp.arguments(ApprovalDecisionSchema)
+    @blp.response(200, ApprovalTicketSchema(many=True))
+    def post(self, decision_data):
+        """Approve or reject several pending tickets at once
+
+        All tickets must be waiting for the current user's approval; otherwise
+        none is decided and the response lists the offending ids.
+        """
+        logger = current_app.logger
+        decision = decision_data["decision"]
+        try:
+            tickets, invalid_ids = decide_approvals(
+                current_user.id, decision_data["ticket_ids"], decision, decision_data.get("reason")
+            )
+            if invalid_ids:
+                db.session.rollback()
+                logger.warning(f"User ID {current_user.id} cannot decide tickets {invalid_ids}.")
+                abort(
+                    409,
+                    message="Some tickets are not pending your approval.",
+                    errors={"ticket_ids": invalid_ids},
+                )
+            db.session.commit()
+            logger.info(f"User ID {current_user.id} {decision}d tickets {[ticket.id for ticket in tickets]}.")
+            return tickets
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error while deciding approvals for user ID {current_user.id}: {e}")
+            abort(500, message="An error occurred while saving the approval decisions.")
@@ -0,0 +1,24 @@
+from flask import current_app
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import SQLAlchemyError
+
+from assignment import get_workload_index
+from schemas import WorkloadSchema
+
+blp = Blueprint("Assignment", "assignment", description="Automatic ticket assignment")
+
+
+@blp.route("/assignment/workload")
+class Workload(MethodView):
+    @jwt_required()
+    @blp.response(200, WorkloadSchema(many=True))
+    def get(self):
+        """Open tickets per agent, in total and per category"""
+        logger = current_app.logger
+        try:
+            return get_workload_index().workload()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error while fetching agent workload: {e}")
+            abort(500, message="An error occurred while fetching the agent workload.")
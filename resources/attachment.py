@@ -4,9 +4,14 @@ from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import SQLAlchemyError
 
 from db import db
+from idempotency import idempotent
 from models import AttachmentModel, TicketModel
 from schemas import AttachmentSchema
-from flask import request, send_file, current_app
+from previews import can_preview, preview_key, remove_preview, schedule_preview
+from attachment_store import PLACEHOLDER_PATH, discard_files, is_shared, upload_key
+from archives import stream_zip, unique_names
+from storage import StorageError, get_storage
+from flask import request, send_file, current_app, redirect
 import os
 import mimetypes
 
@@ -43,6 +48,7 @@ class AttachmentList(MethodView):
         return ticket.attachments
 
     @jwt_required(fresh=True)
+    @idempotent
     @blp.arguments(AttachmentSchema)
     @blp.response(201, AttachmentSchema)
     def post(self, attachment_data, ticket_id):
@@ -53,7 +59,7 @@ class AttachmentList(MethodView):
         attachment = AttachmentModel(
             ticket_id=ticket_id,
             filename=attachment_data["filename"],
-            filepath='/'
+            filepath=PLACEHOLDER_PATH
         )
 
         try:
@@ -67,6 +73,86 @@ class AttachmentList(MethodView):
         return attachment, 201
 
 
+@blp.route("/ticket/<int:ticket_id>/attachments/upload")
+class AttachmentBatchUpload(MethodView):
+    @jwt_required(fresh=True)
+    @idempotent
+    @blp.response(201, AttachmentSchema(many=True))
+    def post(self, ticket_id):
+        """Create attachments for a ticket from one or more uploaded files in a single request
+
+        Send each file as a 'file' part; optional 'filename' parts name the files in the same order.
+        """
+        logger = current_app.logger
+        TicketModel.query.get_or_404(ticket_id)
+
+        files = [file for file in request.files.getlist('file') if file.filename]
+        names = request.form.getlist('filename')
+        if not files:
+            logger.warning(f"No file selected for upload for ticket ID {ticket_id}.")
+            abort(400, message="No selected file.")
+        if len(files) > current_app.config["ATTACHMENT_MAX_FILES"]:
+            abort(400, message=f"At most {current_app.config['ATTACHMENT_MAX_FILES']} files can be uploaded at once.")
+        if len(names) > len(files):
+            abort(400, message="More filenames than files were sent.")
+
+        storage = get_storage()
+        saved = []
+        try:
+            attachments = []
+            for position, file in enumerate(files):
+                key = upload_key(current_app.config["UPLOAD_FOLDER"], ticket_id, file.filename)
+                storage.save(key, file.stream)
+                saved.append(key)
+                attachments.append(AttachmentModel(
+                    ticket_id=ticket_id,
+                    filename=names[position] if position < len(names) else file.filename,
+                    filepath=key
+                ))
+
+            db.session.add_all(attachments)
+            db.session.commit()
+            logger.info(f"Uploaded {len(attachments)} attachments for ticket ID {ticket_id}.")
+        except (StorageError, SQLAlchemyError) as e:
+            db.session.rollback()
+            discard_files(storage, saved)
+            logger.error(f"Error while saving attachments for ticket ID {ticket_id}: {e}")
+            abort(500, message="An error occurred while saving the attachments.")
+
+        for key in saved:
+            schedule_preview(current_app._get_current_object(), key)
+
+        return attachments, 201
+
+
+@blp.route("/ticket/<int:ticket_id>/attachments/archive")
+class AttachmentArchive(MethodView):
+    @jwt_required()
+    def get(self, ticket_id):
+        """Download all attachments of a ticket as a zip archive streamed on the fly"""
+        logger = current_app.logger
+        TicketModel.query.get_or_404(ticket_id)
+
+        attachments = (
+            AttachmentModel.query.filter_by(ticket_id=ticket_id)
+            .filter(AttachmentModel.filepath != PLACEHOLDER_PATH)
+            .order_by(AttachmentModel.id)
+            .all()
+        )
+        keys = [attachment.filepath for attachment in attachments]
+        names = unique_names([os.path.basename(attachment.filename) or "file" for attachment in attachments])
+        if not keys:
+            abort(404, message="This ticket has no uploaded attachments.")
+
+        logger.info(f"Streaming archive of {len(keys)} attachments for ticket ID {ticket_id}.")
+        response = current_app.response_class(
+            stream_zip(get_storage(), list(zip(keys, names))), mimetype="application/zip"
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="ticket-{ticket_id}-attachments.zip"'
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+
 @blp.route("/ticket/<int:ticket_id>/attachments/<int:attachment_id>/upload")
 class AttachmentUpload(MethodView):
     @jwt_required(fresh=True)
@@ -86,20 +172,31 @@ class AttachmentUpload(MethodView):
             logger.warning(f"No file selected for upload for ticket ID {ticket_id}, attachment ID {attachment_id}.")
             abort(400, message="No selected file.")
 
-        file_path = os.path.join(f"uploads/{ticket_id}", file.filename).replace('\\', '/')
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        file.save(file_path)
+        storage = get_storage()
+        key = upload_key(current_app.config["UPLOAD_FOLDER"], ticket_id, file.filename)
+        try:
+            storage.save(key, file.stream)
+        except StorageError as e:
+            logger.error(f"Error while storing file for ticket ID {ticket_id}, attachment ID {attachment_id}: {e}")
+            abort(500, message="An error occurred while saving the file.")
 
-        attachment.filepath = file_path
+        previous = attachment.filepath
+        attachment.filepath = key
 
         try:
             db.session.commit()
             logger.info(
                 f"File uploaded and saved for ticket ID {ticket_id}, attachment ID {attachment_id}: {file.filename}.")
         except SQLAlchemyError as e:
+            db.session.rollback()
+            discard_files(storage, [key])
             logger.error(f"Error while saving file path to the database: {e}")
             abort(500, message="An error occurred while saving the file path.")
 
+        if previous != PLACEHOLDER_PATH and not is_shared(previous, attachment_id):
+            discard_files(storage, [previous, preview_key(previous)])
+        schedule_preview(current_app._get_current_object(), key)
+
         return {"message": "Attachment saved successfully."}, 201
 
 
@@ -121,8 +218,10 @@ class Attachment(MethodView):
         attachment = AttachmentModel.query.filter_by(ticket_id=ticket_id, id=attachment_id).first_or_404()
 
         try:
-            if os.path.exists(attachment.filepath):
-                os.remove(attachment.filepath)
+            if attachment.filepath != PLACEHOLDER_PATH and not is_shared(attachment.filepath, attachment_id):
+                storage = get_storage()
+                storage.delete(attachment.filepath)
+                remove_preview(storage, attachment.filepath)
                 logger.info(f"File deleted for attachment ID {attachment_id} and ticket ID {ticket_id}.")
         except Exception as e:
             logger.error(f"Error while deleting file for attachment ID {attachment_id}, ticket ID {ticket_id}: {e}")
@@ -149,14 +248,21 @@ class AttachmentDownload(MethodView):
 
         attachment = AttachmentModel.query.filter_by(ticket_id=ticket_id, id=attachment_id).first_or_404()
 
-        if not os.path.exists(attachment.filepath):
+        storage = get_storage()
+        if attachment.filepath == PLACEHOLDER_PATH or storage.stat(attachment.filepath) is None:
             logger.warning(f"File not found for attachment ID {attachment_id} and ticket ID {ticket_id}.")
             abort(404, message="File not found.")
 
+        # Object stores serve the file themselves through a short-lived signed URL
+        url = storage.url(attachment.filepath, filename=os.path.basename(attachment.filepath))
+        if url is not None:
+            logger.info(f"Redirected download of attachment ID {attachment_id} and ticket ID {ticket_id}.")
+            return redirect(url)
+
         mime_type, _ = mimetypes.guess_type(attachment.filepath)
 
         try:
-            response = send_file(attachment.filepath, as_attachment=True)
+            response = send_file(os.path.abspath(storage.local_path(attachment.filepath)), as_attachment=True)
 
             response.headers['Content-Type'] = mime_type or 'application/octet-stream'
             response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(attachment.filepath)}"'
@@ -170,3 +276,36 @@ class AttachmentDownload(MethodView):
         except Exception as e:
             logger.error(f"Error while downloading file for attachment ID {attachment_id}, ticket ID {ticket_id}: {e}")
             abort(500, message=f"An error occurred while downloading the file: {str(e)}")
+
+
+@blp.route("/ticket/<int:ticket_id>/attachments/<int:attachment_id>/preview")
+class AttachmentPreview(MethodView):
+    @jwt_required()
+    def get(self, ticket_id, attachment_id):
+        """Get a small JPEG preview of an image or PDF attachment"""
+        logger = current_app.logger
+        attachment = AttachmentModel.query.filter_by(ticket_id=ticket_id, id=attachment_id).first_or_404()
+
+        storage = get_storage()
+        preview = preview_key(attachment.filepath)
+        if storage.stat(preview) is None:
+            if not can_preview(attachment.filepath) or storage.stat(attachment.filepath) is None:
+                abort(404, message="No preview is available for this attachment.")
+            # Files uploaded before previews existed get theirs generated now
+            schedule_preview(current_app._get_current_object(), attachment.filepath)
+            logger.info(f"Preview not ready for attachment ID {attachment_id} and ticket ID {ticket_id}.")
+            abort(404, message="The preview is not ready yet.")
+
+        url = storage.url(preview)
+        if url is not None:
+            return redirect(url)
+
+        response = send_file(
+            os.path.abspath(storage.local_path(preview)),
+            mimetype="image/jpeg",
+            max_age=current_app.config["PREVIEW_MAX_AGE"],
+        )
+        # Previews never change for a given attachment; let the browser, not shared caches, keep them
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
@@ -1,16 +1,38 @@
+import base64
+import binascii
+
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import selectinload
 from flask import current_app
 
 from db import db
+from idempotency import idempotent
 from models import CommentModel, TicketModel, UserModel
-from schemas import CommentSchema, PlainCommentSchema
+from schemas import CommentSchema, PlainCommentSchema, CommentPageQuerySchema, CommentPageSchema
+from serializers import dump_response
+from responses import if_match_versions, precondition_failed, versioned
+from permissions import is_admin
 
 blp = Blueprint("Comments", "comments", description="Operations on comments")
 
 
+def encode_cursor(comment_id):
+    """Encode the last comment ID of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(str(comment_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor, aborting with 400 if it is malformed."""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, message="Invalid cursor.")
+
+
 @blp.route("/ticket/<int:ticket_id>/comments")
 class CommentList(MethodView):
     @jwt_required()
@@ -21,36 +43,33 @@ class CommentList(MethodView):
         try:
             logger.info(f"Retrieving comments for ticket ID {ticket_id}.")
             ticket = TicketModel.query.get_or_404(ticket_id)
+            comments = CommentModel.query.filter_by(ticket_id=ticket.id).options(
+                selectinload(CommentModel.user)
+            ).all()
             logger.info(f"Successfully retrieved comments for ticket ID {ticket_id}.")
-            return ticket.comments  # Return the list of comments for the ticket
+            return dump_response(CommentSchema, comments)
         except SQLAlchemyError as e:
             logger.error(f"Error while retrieving comments for ticket ID {ticket_id}: {e}")
             abort(500, message="An error occurred while retrieving the comments.")
 
     @jwt_required()
+    @idempotent
     @blp.arguments(CommentSchema)
     @blp.response(201, CommentSchema)
     def post(self, comment_data, ticket_id):
         """Create a new comment on a specific ticket"""
         logger = current_app.logger
-        username = get_jwt_identity()  # Get the username from the JWT token
+        username = current_user.username  # Resolved from the JWT by the cached user loader
         try:
             ticket = TicketModel.query.get_or_404(ticket_id)  # Fetch the ticket
         except SQLAlchemyError as e:
             logger.error(f"Error while retrieving ticket ID {ticket_id}: {e}")
             abort(500, message="An error occurred while retrieving the ticket.")
 
-        # Fetch the user based on the username
-        user = UserModel.query.filter_by(username=username).first()
-
-        if not user:
-            logger.warning(f"User with username {username} not found.")
-            abort(404, message="User not found.")
-
         # Create a new comment using the user ID
         comment = CommentModel(
             ticket_id=ticket_id,
-            user_id=user.id,  # Get user ID from the user object
+            user_id=current_user.id,
             content=comment_data["content"],
         )
 
@@ -66,9 +85,49 @@ class CommentList(MethodView):
         return comment
 
 
+@blp.route("/ticket/<int:ticket_id>/comments/thread")
+class CommentThread(MethodView):
+    @jwt_required()
+    @blp.arguments(CommentPageQuerySchema, location="query")
+    @blp.response(200, CommentPageSchema)
+    def get(self, page_args, ticket_id):
+        """Get one page of a ticket's comments, with their authors side-loaded once"""
+        logger = current_app.logger
+        try:
+            ticket = TicketModel.query.get_or_404(ticket_id)
+            query = CommentModel.query.filter_by(ticket_id=ticket.id)
+
+            newest_first = page_args["order"] == "desc"
+            if "cursor" in page_args:
+                after = decode_cursor(page_args["cursor"])
+                query = query.filter(CommentModel.id < after if newest_first else CommentModel.id > after)
+            query = query.order_by(CommentModel.id.desc() if newest_first else CommentModel.id)
+
+            # One extra row tells whether there is a next page
+            limit = page_args["limit"]
+            comments = query.limit(limit + 1).all()
+            next_cursor = encode_cursor(comments[limit - 1].id) if len(comments) > limit else None
+            comments = comments[:limit]
+
+            user_ids = {comment.user_id for comment in comments}
+            users = UserModel.query.filter(UserModel.id.in_(user_ids)).all() if user_ids else []
+
+            logger.info(f"Retrieved {len(comments)} comments for ticket ID {ticket_id}.")
+            return {
+                "comments": comments,
+                "users": {str(user.id): user for user in users},
+                "comment_count": ticket.comment_count,
+                "next_cursor": next_cursor,
+            }
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving comments for ticket ID {ticket_id}: {e}")
+            abort(500, message="An error occurred while retrieving the comments.")
+
+
 @blp.route("/comments/<int:comment_id>")
 class Comment(MethodView):
     @jwt_required()
+    @versioned
     @blp.response(200, CommentSchema)
     def get(self, comment_id):
         """Get a specific comment by ID"""
@@ -90,6 +149,9 @@ class Comment(MethodView):
         try:
             logger.info(f"Deleting comment ID {comment_id}.")
             comment = CommentModel.query.get_or_404(comment_id)
+            if comment.user_id != current_user.id and not is_admin():
+                logger.warning(f"User ID {current_user.id} is not authorized to delete comment ID {comment_id}.")
+                abort(403, message="You do not have permission to delete this comment.")
             db.session.delete(comment)
             db.session.commit()
             logger.info(f"Successfully deleted comment ID {comment_id}.")
@@ -100,10 +162,15 @@ class Comment(MethodView):
         return {"message": "Comment deleted."}
 
     @jwt_required()
+    @versioned
     @blp.arguments(PlainCommentSchema)
     @blp.response(200, CommentSchema)
     def put(self, comment_data, comment_id):
-        """Update an existing comment by ID"""
+        """Update an existing comment by ID
+
+        Send the ETag of the comment in If-Match to update it only if nobody
+        changed it since; otherwise the response is 412 with the current comment.
+        """
         logger = current_app.logger
         try:
             logger.info(f"Updating comment ID {comment_id}.")
@@ -113,16 +180,25 @@ class Comment(MethodView):
             abort(500, message="An error occurred while retrieving the comment.")
 
         # Ensure the user trying to update is the one who posted the comment
-        user_id = get_jwt_identity()
-        if comment.user_id != user_id:
-            logger.warning(f"User ID {user_id} is not authorized to update comment ID {comment_id}.")
+        if comment.user_id != current_user.id and not is_admin():
+            logger.warning(f"User ID {current_user.id} is not authorized to update comment ID {comment_id}.")
             abort(403, message="You do not have permission to update this comment.")
 
+        versions = if_match_versions()
+        if versions is not None and comment.version not in versions:
+            logger.warning(f"Comment ID {comment_id} changed since version {versions}; update refused.")
+            return precondition_failed(CommentSchema, comment)
+
         comment.content = comment_data.get("content", comment.content)
 
         try:
             db.session.commit()
             logger.info(f"Successfully updated comment ID {comment_id}.")
+        except StaleDataError:
+            # Another request updated the comment between our read and write
+            db.session.rollback()
+            logger.warning(f"Comment ID {comment_id} was updated concurrently; update refused.")
+            return precondition_failed(CommentSchema, CommentModel.query.get(comment_id))
         except SQLAlchemyError as e:
             logger.error(f"Error while updating comment ID {comment_id}: {e}")
             abort(500, message="An error occurred while updating the comment.")
@@ -2,11 +2,14 @@ from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from flask import current_app
 
 from db import db
 from models import ConfigMasterModel
-from schemas import ConfigMasterSchema, ConfigMasterUpdateSchema
+from schemas import ConfigMasterSchema, ConfigMasterUpdateSchema, ConfigTreeSchema
+from config_index import get_config_index
+from responses import if_match_versions, precondition_failed, versioned
 
 blp = Blueprint("ConfigMaster", "configMaster", description="Operations on configuration settings")
 
@@ -14,6 +17,7 @@ blp = Blueprint("ConfigMaster", "configMaster", description="Operations on confi
 @blp.route("/configmaster/<int:config_id>")
 class ConfigMaster(MethodView):
     @jwt_required()
+    @versioned
     @blp.response(200, ConfigMasterSchema)
     def get(self, config_id):
         """Get a specific configuration by ID"""
@@ -34,10 +38,17 @@ class ConfigMaster(MethodView):
         logger.info(f"Successfully deleted configuration with ID {config_id}.")
         return {"message": "Configuration deleted."}
 
+    @jwt_required()
+    @versioned
     @blp.arguments(ConfigMasterUpdateSchema)
     @blp.response(200, ConfigMasterSchema)
     def put(self, config_data, config_id):
-        """Update an existing configuration"""
+        """Update an existing configuration
+
+        Send the ETag of the configuration in If-Match to update it only if
+        nobody changed it since; otherwise the response is 412 with the
+        current configuration.
+        """
         logger = current_app.logger
         logger.info(f"Updating configuration with ID {config_id}.")
         config = ConfigMasterModel.query.get(config_id)
@@ -46,6 +57,11 @@ class ConfigMaster(MethodView):
             logger.warning(f"Configuration with ID {config_id} not found.")
             abort(404, message="Configuration not found.")
 
+        versions = if_match_versions()
+        if versions is not None and config.version not in versions:
+            logger.warning(f"Configuration with ID {config_id} changed since version {versions}; update refused.")
+            return precondition_failed(ConfigMasterSchema, config)
+
         # Update configuration fields only if provided in the request
         config.type = config_data.get("type", config.type)
         config.value = config_data.get("value", config.value)
@@ -56,6 +72,11 @@ class ConfigMaster(MethodView):
         try:
             db.session.commit()
             logger.info(f"Successfully updated configuration with ID {config_id}.")
+        except StaleDataError:
+            # Another request updated the configuration between our read and write
+            db.session.rollback()
+            logger.warning(f"Configuration with ID {config_id} was updated concurrently; update refused.")
+            return precondition_failed(ConfigMasterSchema, ConfigMasterModel.query.get(config_id))
         except SQLAlchemyError as e:
             logger.error(f"Error while updating configuration with ID {config_id}: {e}")
             abort(500, message="An error occurred while updating the configuration.")
@@ -63,6 +84,17 @@ class ConfigMaster(MethodView):
         return config
 
 
+@blp.route("/configmaster/tree")
+class ConfigMasterTree(MethodView):
+    @jwt_required()
+    @blp.response(200, ConfigTreeSchema)
+    def get(self):
+        """Get all configurations as a tree, e.g. categories with their subcategories"""
+        logger = current_app.logger
+        logger.info("Retrieving configuration tree.")
+        return {"types": get_config_index().tree()}
+
+
 @blp.route("/configmaster")
 class ConfigMasterList(MethodView):
     @jwt_required()
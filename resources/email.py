@@ -1,7 +1,6 @@
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from flask_jwt_extended import jwt_required
-from flask_mail import Message
 from schemas import MailSchema
 from flask import current_app
 
@@ -9,6 +8,16 @@ from flask import current_app
 blp = Blueprint("Mail", "mail", description="Operations related to sending emails")
 
 
+def get_mail():
+    """Return the app's Flask-Mail extension, creating it on first use."""
+    mail = current_app.extensions.get("mail")
+    if mail is None:
+        from flask_mail import Mail
+
+        mail = Mail(current_app)
+    return mail
+
+
 @blp.route("/mail/send")
 class MailSender(MethodView):
     @jwt_required()
@@ -24,9 +33,11 @@ class MailSender(MethodView):
                                current_app.config["MAIL_DEFAULT_SENDER"])  # Use default sender if not provided
         try:
             # Use Flask-Mail to send the email
+            from flask_mail import Message
+
             with current_app.app_context():
                 msg = Message(subject=subject, recipients=recipients, body=body, sender=sender)
-                current_app.extensions["mail"].send(msg)
+                get_mail().send(msg)
 
             logger.info(f"Email sent successfully to recipients: {recipients}.")
         except Exception as e:
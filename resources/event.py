@@ -0,0 +1,60 @@
+import json
+import queue
+
+from flask import Response, current_app
+from flask.views import MethodView
+from flask_smorest import Blueprint
+from flask_jwt_extended import jwt_required
+
+from events import get_broker
+from schemas import EventStreamQuerySchema
+
+blp = Blueprint("Events", "events", description="Live ticket updates")
+
+
+def event_matches(payload, filters):
+    """Check an event against the optional assignee/status filters."""
+    if "assignee" in filters and payload.get("assigned_to") != filters["assignee"]:
+        return False
+    if "status" in filters and payload.get("status") != filters["status"]:
+        return False
+    return True
+
+
+def event_stream(broker, subscriber, filters, heartbeat):
+    """Yields SSE frames for the subscriber until the client disconnects."""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                payload = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event_matches(payload, filters):
+                yield f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@blp.route("/events/stream")
+class EventStream(MethodView):
+    # EventSource cannot set headers, so the token may also come as ?jwt=
+    @jwt_required(locations=["headers", "query_string"])
+    @blp.arguments(EventStreamQuerySchema, location="query")
+    def get(self, filters):
+        """Stream ticket, comment and assignment events (Server-Sent Events)"""
+        logger = current_app.logger
+        broker = get_broker()
+        subscriber = broker.subscribe()
+        logger.info(f"Event stream opened with filters {filters}.")
+
+        # The generator deliberately runs without the app context so an idle
+        # connection holds no database session.
+        response = Response(
+            event_stream(broker, subscriber, filters, current_app.config["EVENTS_HEARTBEAT_SECONDS"]),
+            mimetype="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
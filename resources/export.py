@@ -0,0 +1,34 @@
+from flask import current_app
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+from flask_jwt_extended import jwt_required, current_user
+
+from exports import export_running, load_export_state, start_export
+from schemas import ExportRequestSchema, ExportStatusSchema
+from storage import get_storage
+
+blp = Blueprint("Exports", "exports", description="Reporting data export")
+
+
+@blp.route("/export")
+class Export(MethodView):
+    @jwt_required()
+    @blp.response(200, ExportStatusSchema)
+    def get(self):
+        """Get the result of the last export run"""
+        state = load_export_state(get_storage(), current_app.config["EXPORT_FOLDER"].strip("/")) or {}
+        return {**state, "running": export_running()}
+
+    @jwt_required()
+    @blp.arguments(ExportRequestSchema)
+    @blp.response(202, ExportStatusSchema)
+    def post(self, export_data):
+        """Start an export of tickets, comments and activity logs
+
+        The export runs in the background; poll GET /export for its result.
+        """
+        logger = current_app.logger
+        if not start_export(current_app._get_current_object(), export_data["full"]):
+            abort(409, message="An export is already running.")
+        logger.info(f"User ID {current_user.id} started an export (full={export_data['full']}).")
+        return {"running": True}
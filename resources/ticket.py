@@ -1,19 +1,57 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import selectinload
 
 from flask import current_app
 from db import db
-from models import TicketModel, UserModel
-from schemas import TicketSchema, TicketUpdateSchema
+from idempotency import idempotent
+from assignment import choose_assignee
+from similarity import find_similar
+from config_index import validate_ticket_config
+from models import TicketModel, UserModel, CommentModel, ActivityLogModel, AttachmentModel, TombstoneModel
+from schemas import (
+    TicketSchema, TicketUpdateSchema, TicketChangesQuerySchema, TicketChangesSchema, SimilarTicketQuerySchema,
+    SimilarTicketSchema,
+)
+from responses import conditional, if_match_versions, precondition_failed, versioned
+from serializers import dump_response
 
 blp = Blueprint("Tickets", "tickets", description="Operations on tickets")
 
 
+def encode_cursor(timestamp):
+    """Encode a change timestamp as an opaque sync cursor."""
+    return base64.urlsafe_b64encode(timestamp.isoformat().encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a sync cursor, aborting with 400 if it is malformed."""
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, message="Invalid cursor.")
+
+
+def changed_since(model, since):
+    """Rows of ``model`` created or updated at or after ``since`` (all rows if None)."""
+    query = model.query
+    if since is not None:
+        query = query.filter(model.updated_at >= since)
+    return query.order_by(model.updated_at, model.id).all()
+
+
 @blp.route("/ticket/<int:ticket_id>")
 class Ticket(MethodView):
     @jwt_required()
+    @versioned
     @blp.response(200, TicketSchema)
     def get(self, ticket_id):
         """Get a specific ticket by ID"""
@@ -41,17 +79,33 @@ class Ticket(MethodView):
             logger.error(f"Error deleting ticket {ticket_id}: {e}")
             abort(500, message="An error occurred while deleting the ticket.")
 
+    @jwt_required()
+    @versioned
     @blp.arguments(TicketUpdateSchema)
     @blp.response(200, TicketSchema)
     def put(self, ticket_data, ticket_id):
-        """Update an existing ticket"""
+        """Update an existing ticket
+
+        Send the ETag of the ticket in If-Match to update it only if nobody
+        changed it since; otherwise the response is 412 with the current ticket.
+        """
         logger = current_app.logger
-        try:
-            ticket = TicketModel.query.get(ticket_id)
+        ticket = TicketModel.query.get(ticket_id)
+        if not ticket:
+            logger.warning(f"Ticket {ticket_id} not found.")
+            abort(404, message="Ticket not found.")
 
-            if not ticket:
-                logger.warning(f"Ticket {ticket_id} not found.")
-                abort(404, message="Ticket not found.")
+        if "subcategory" in ticket_data and "category" not in ticket_data:
+            # The schema could only check that the subcategory exists; it must belong to the stored category
+            errors = validate_ticket_config({"subcategory": ticket_data["subcategory"]}, ticket.category)
+            if errors:
+                abort(422, errors={"json": errors})
+
+        try:
+            versions = if_match_versions()
+            if versions is not None and ticket.version not in versions:
+                logger.warning(f"Ticket {ticket_id} changed since version {versions}; update refused.")
+                return precondition_failed(TicketSchema, ticket)
 
             # Update ticket fields only if provided in the request
             ticket.title = ticket_data.get("title", ticket.title)
@@ -66,33 +120,116 @@ class Ticket(MethodView):
             db.session.commit()
             logger.info(f"Ticket {ticket_id} updated successfully.")
             return ticket
+        except StaleDataError:
+            # Another request updated the ticket between our read and write
+            db.session.rollback()
+            logger.warning(f"Ticket {ticket_id} was updated concurrently; update refused.")
+            return precondition_failed(TicketSchema, TicketModel.query.get(ticket_id))
         except Exception as e:
             logger.error(f"Error updating ticket {ticket_id}: {e}")
             abort(500, message="An error occurred while updating the ticket.")
 
 
+@blp.route("/ticket/changes")
+class TicketChanges(MethodView):
+    @jwt_required()
+    @blp.arguments(TicketChangesQuerySchema, location="query")
+    @blp.response(200, TicketChangesSchema)
+    def get(self, query_args):
+        """Get tickets, comments and attachments changed since a cursor
+
+        Changes are selected on the indexed updated_at columns and deletions
+        come from the tombstones table. The returned cursor trails the database
+        clock by CHANGES_OVERLAP_SECONDS so rows committed late by concurrent
+        transactions are not missed; clients may therefore see a change twice
+        and should apply them idempotently.
+        """
+        logger = current_app.logger
+        since = decode_cursor(query_args["since"]) if "since" in query_args else None
+        try:
+            now = db.session.execute(select(func.current_timestamp())).scalar()
+            overlap = timedelta(seconds=current_app.config["CHANGES_OVERLAP_SECONDS"])
+            cursor = now - overlap if since is None else max(since, now - overlap)
+
+            deleted = []
+            if since is not None:
+                deleted = TombstoneModel.query.filter(TombstoneModel.deleted_at >= since).order_by(
+                    TombstoneModel.deleted_at, TombstoneModel.id
+                ).all()
+
+            changes = {
+                "cursor": encode_cursor(cursor),
+                "tickets": changed_since(TicketModel, since),
+                "comments": changed_since(CommentModel, since),
+                "attachments": changed_since(AttachmentModel, since),
+                "deleted": deleted,
+            }
+            logger.info(f"Ticket changes since {since} retrieved successfully.")
+            return changes
+        except SQLAlchemyError as e:
+            logger.error(f"Error retrieving ticket changes since {since}: {e}")
+            abort(500, message="An error occurred while retrieving ticket changes.")
+
+
+@blp.route("/ticket/similar")
+class SimilarTickets(MethodView):
+    @jwt_required()
+    @blp.arguments(SimilarTicketQuerySchema, location="query")
+    @blp.response(200, SimilarTicketSchema(many=True))
+    def get(self, query_args):
+        """Get recent tickets likely to duplicate a title and description
+
+        Meant to be called while a ticket is being written, so the user can
+        follow an existing ticket instead of opening another one.
+        """
+        logger = current_app.logger
+        try:
+            matches = find_similar(
+                query_args["title"], query_args.get("description"), query_args["limit"], query_args.get("exclude")
+            )
+            logger.info(f"Found {len(matches)} tickets similar to '{query_args['title']}'.")
+            return [{"ticket": ticket, "score": round(score, 3)} for ticket, score in matches]
+        except SQLAlchemyError as e:
+            logger.error(f"Error finding tickets similar to '{query_args['title']}': {e}")
+            abort(500, message="An error occurred while looking for similar tickets.")
+
+
 @blp.route("/ticket")
 class TicketList(MethodView):
     @jwt_required()
+    @conditional(TicketModel, UserModel, CommentModel, ActivityLogModel, AttachmentModel)
     @blp.response(200, TicketSchema(many=True))
     def get(self):
         """Get a list of all tickets"""
         logger = current_app.logger
         try:
-            tickets = TicketModel.query.all()
+            tickets = TicketModel.query.options(
+                selectinload(TicketModel.creator),
+                selectinload(TicketModel.assignee),
+                selectinload(TicketModel.approver),
+                selectinload(TicketModel.comments),
+                selectinload(TicketModel.activity_logs),
+                selectinload(TicketModel.attachments),
+            ).all()
             logger.info("All tickets retrieved successfully.")
-            return tickets
+            return dump_response(TicketSchema, tickets)
         except Exception as e:
             logger.error(f"Error retrieving tickets: {e}")
             abort(500, message="An error occurred while retrieving tickets.")
 
     @jwt_required(fresh=True)
+    @idempotent
     @blp.arguments(TicketSchema)
     @blp.response(201, TicketSchema)
     def post(self, ticket_data):
         """Create a new ticket"""
         logger = current_app.logger
         try:
+            if ticket_data.get("assigned_to") is None:
+                assignee_id = choose_assignee(ticket_data)
+                if assignee_id is not None:
+                    ticket_data["assigned_to"] = assignee_id
+                    logger.info(f"Auto-assigning new ticket to user {assignee_id}.")
             ticket = TicketModel(**ticket_data)
             db.session.add(ticket)
             db.session.commit()
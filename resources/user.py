@@ -9,20 +9,26 @@ from flask_jwt_extended import (
     get_jwt_identity,
     get_jwt,
     jwt_required,
+    current_user,
 )
 from passlib.hash import pbkdf2_sha256
 from sqlalchemy.exc import SQLAlchemyError
 
 from db import db
-from models import UserModel
+from models import UserModel, TicketModel, CommentModel, ActivityLogModel
 from schemas import UserSchema, LoginSchema, UpdateUserSchema
 from blocklist import BLOCKLIST
+from auth import invalidate_user, user_claims
+from responses import conditional
+from permissions import ADMIN, SELF, is_admin
 
 blp = Blueprint("Users", "users", description="Operations on users")
 
 
 @blp.route("/register")
 class UserRegister(MethodView):
+    permissions = {"post": ADMIN}
+
     @jwt_required()
     @blp.arguments(UserSchema)
     def post(self, user_data):
@@ -63,9 +69,12 @@ class UserLogin(MethodView):
 
         if user and pbkdf2_sha256.verify(user_data["password"], user.password):
             access_token_expires = timedelta(minutes=30)
-            access_token = create_access_token(identity=user.username, fresh=True, expires_delta=access_token_expires)
+            claims = user_claims(user)
+            access_token = create_access_token(identity=user.username, fresh=True, expires_delta=access_token_expires,
+                                               additional_claims=claims)
             refresh_token_expires = timedelta(minutes=120)
-            refresh_token = create_refresh_token(user.username, expires_delta=refresh_token_expires)
+            refresh_token = create_refresh_token(user.username, expires_delta=refresh_token_expires,
+                                                 additional_claims=claims)
             user_serialized = UserSchema().dump(user)
             logger.info("User '%s' logged in successfully.", user_data["username"])
             return {"access_token": access_token, "refresh_token": refresh_token, "user": user_serialized}, 200
@@ -88,6 +97,8 @@ class UserLogout(MethodView):
 
 @blp.route("/user/<int:user_id>")
 class User(MethodView):
+    permissions = {"delete": ADMIN, "put": f"{ADMIN}|{SELF}"}
+
     @jwt_required()
     @blp.response(200, UserSchema)
     def get(self, user_id):
@@ -106,6 +117,7 @@ class User(MethodView):
         try:
             db.session.delete(user)
             db.session.commit()
+            invalidate_user(user.username)
             logger.info("User with ID: %d deleted successfully.", user_id)
         except SQLAlchemyError as err:
             logger.error("Error deleting user with ID: %d. Details: %s", user_id, str(err))
@@ -123,6 +135,16 @@ class User(MethodView):
         logger = current_app.logger
         logger.info("Updating details for user with ID: %d", user_id)
         user = UserModel.query.get_or_404(user_id)
+        previous_username = user.username
+
+        # Users may edit their own details, but only administrators grant roles
+        changes_access = (
+            user_data.get("role", user.role) != user.role
+            or bool(user_data.get("approver", user.approver)) != bool(user.approver)
+        )
+        if changes_access and not is_admin():
+            logger.warning("User ID %d cannot change their own role or approver flag.", user_id)
+            abort(403, message="Only administrators can change roles.")
 
         # Update user fields
         user.username = user_data["username"]
@@ -138,6 +160,7 @@ class User(MethodView):
             user.approver = user_data["approver"]
         try:
             db.session.commit()
+            invalidate_user(previous_username, user.username)
             logger.info("User with ID: %d updated successfully.", user_id)
         except SQLAlchemyError as err:
             logger.error("Error updating user with ID: %d. Details: %s", user_id, str(err))
@@ -152,19 +175,21 @@ class TokenRefresh(MethodView):
     def post(self):
         """Refresh JWT Token."""
         logger = current_app.logger
-        current_user = get_jwt_identity()
+        username = get_jwt_identity()
         access_token_expires = timedelta(minutes=30)
-        new_token = create_access_token(identity=current_user, fresh=False, expires_delta=access_token_expires)
+        new_token = create_access_token(identity=username, fresh=False, expires_delta=access_token_expires,
+                                        additional_claims=user_claims(current_user))
 
         jti = get_jwt()["jti"]
         BLOCKLIST.add(jti)
-        logger.info("JWT token refreshed for user: %s", current_user)
+        logger.info("JWT token refreshed for user: %s", username)
         return {"access_token": new_token}, 200
 
 
 @blp.route("/user")
 class UserList(MethodView):
     @jwt_required()
+    @conditional(UserModel, TicketModel, CommentModel, ActivityLogModel)
     @blp.response(200, UserSchema(many=True))
     def get(self):
         """Get a list of all users."""
@@ -0,0 +1,177 @@
+"""
+responses.py
+
+Response post-processing shared by every blueprint: weak ETags with
+If-None-Match handling for GET requests, and gzip/brotli compression of large
+bodies based on the client's Accept-Encoding.
+
+List views whose payload is fully determined by a handful of tables can also
+use the ``conditional`` decorator, which answers revalidations from the
+tables' change counters (one primary key lookup) without loading or
+serializing anything.
+
+Rows with a ``version`` column (tickets, comments, config entries) are
+updated optimistically: SQLAlchemy issues ``UPDATE ... WHERE id = ? AND
+version = ?`` and raises StaleDataError when another writer got there first.
+Views of such a row use the ``versioned`` decorator, which gives the response
+a strong ETag '"<version>-<digest>"', suffixed with '-gzip' or '-br' when the
+body is compressed. PUT views compare the version of an If-Match header with
+``if_match_versions``, which ignores the suffix, and answer conflicts with
+``precondition_failed``: 412 and the current representation.
+"""
+import gzip
+import hashlib
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import select
+
+from db import db
+from models import TableChangeModel
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/csv"}
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def register_response_hooks(app):
+    """Registers the ETag and compression after-request handlers."""
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_LEVEL", 6)
+    # After-request handlers run in reverse order: ETag first, then compression
+    app.after_request(compress_response)
+    app.after_request(add_etag)
+
+
+def add_etag(response):
+    """Attach a weak ETag to successful JSON GETs and honour If-None-Match."""
+    if request.method not in ("GET", "HEAD") or response.status_code != 200:
+        return response
+    if response.direct_passthrough or response.is_streamed or not response.is_json:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag is None:
+        response.add_etag(weak=True)
+    elif not weak:
+        # compress_response suffixes strong ETags with the content coding, see there
+        for encoded in (f"{etag}-{encoding}" for encoding in CONTENT_CODINGS):
+            if request.if_none_match.contains(encoded):
+                response.set_etag(encoded)
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """Compress the body with brotli or gzip when the client accepts it."""
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return response
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < current_app.config["COMPRESS_MIN_SIZE"]:
+        return response
+
+    offered = list(CONTENT_CODINGS) if brotli is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding is None:
+        return response
+
+    level = current_app.config["COMPRESS_LEVEL"]
+    if encoding == "br":
+        data = brotli.compress(data, quality=min(level, 11))
+    else:
+        data = gzip.compress(data, compresslevel=level)
+
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    # Each coding is a different representation: a strong ETag must tell them apart
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def table_fingerprint(*models):
+    """Return a weak ETag value summarising the current state of ``models``.
+
+    Reads the change counter of each table, which every flush that inserts,
+    updates or deletes its rows bumps (see models/table_change.py). Unlike a
+    max(updated_at) it notices edits made within the same second, and unlike
+    an aggregate over the rows its cost does not grow with the tables. Rows
+    changed by bulk statements or outside the app are not counted.
+    """
+    tables = sorted(model.__tablename__ for model in models)
+    counters = dict(
+        db.session.execute(
+            select(TableChangeModel.table, TableChangeModel.seq).where(TableChangeModel.table.in_(tables))
+        ).all()
+    )
+    state = repr((request.full_path, tuple(counters.get(table, 0) for table in tables)))
+    return hashlib.sha1(state.encode()).hexdigest()
+
+
+def conditional(*models):
+    """Skip the view when none of ``models`` changed since the client's ETag."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            etag = table_fingerprint(*models)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = current_app.make_response(func(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def versioned(func):
+    """Give responses carrying a row's 'version' field a strong ETag naming that version."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        response = current_app.make_response(func(*args, **kwargs))
+        if response.is_json and response.status_code in (200, 201, 412):
+            body = response.get_json(silent=True)
+            if isinstance(body, dict) and "version" in body:
+                digest = hashlib.sha1(response.get_data()).hexdigest()[:16]
+                response.set_etag(f"{body['version']}-{digest}")
+        return response
+
+    return wrapper
+
+
+def if_match_versions():
+    """Row versions accepted by the request's If-Match header; None without one or for '*'."""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    versions = set()
+    for etag in request.if_match:
+        try:
+            versions.add(int(etag.split("-", 1)[0]))
+        except ValueError:
+            continue  # An ETag of some other representation matches no version
+    return versions
+
+
+def precondition_failed(schema, obj):
+    """412 response with the current representation of ``obj``, for a failed If-Match."""
+    response = current_app.json.response(schema().dump(obj))
+    response.status_code = 412
+    return response
@@ -1,5 +1,7 @@
 # schemas.py
-from marshmallow import Schema, fields
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
+
+from config_index import validate_ticket_config
 
 class PlainUserSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -19,6 +21,12 @@ class PlainTicketSchema(Schema):
     priority = fields.Str(required=True)
     category = fields.Str(required=False)
     subcategory = fields.Str(required=False)
+    comment_count = fields.Int(dump_only=True)
+    due_at = fields.DateTime(dump_only=True)
+    escalated_at = fields.DateTime(dump_only=True)
+    approval_status = fields.Str(allow_none=True, dump_only=True)
+    approval_decided_at = fields.DateTime(allow_none=True, dump_only=True)
+    version = fields.Int(dump_only=True)
 
 
 class PlainCommentSchema(Schema):
@@ -27,6 +35,7 @@ class PlainCommentSchema(Schema):
     user_id = fields.Int(required=True)
     content = fields.Str(required=True)
     created_at = fields.DateTime(dump_only=True)
+    version = fields.Int(dump_only=True)
 
 
 class PlainAttachmentSchema(Schema):
@@ -47,6 +56,7 @@ class PlainActivityLogSchema(Schema):
 class TicketSchema(PlainTicketSchema):
     created_by = fields.Int(required=True, load_only=True)
     assigned_to = fields.Int(allow_none=True, load_only=True)
+    approved_by = fields.Int(allow_none=True, load_only=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     creator = fields.Nested(PlainUserSchema, dump_only=True)
@@ -56,6 +66,12 @@ class TicketSchema(PlainTicketSchema):
     activity_logs = fields.List(fields.Nested(PlainActivityLogSchema), dump_only=True)
     attachments = fields.List(fields.Nested(PlainAttachmentSchema), dump_only=True)
 
+    @validates_schema
+    def validate_config_values(self, data, **kwargs):
+        errors = validate_ticket_config(data)
+        if errors:
+            raise ValidationError(errors)
+
 
 class UserSchema(PlainUserSchema):
     tickets_created = fields.List(fields.Nested(PlainTicketSchema), dump_only=True)
@@ -100,6 +116,78 @@ class TicketUpdateSchema(Schema):
     assigned_to = fields.Int(allow_none=True, required=False)
     approved_by = fields.Int(allow_none=True, required=False)
 
+    @validates_schema
+    def validate_config_values(self, data, **kwargs):
+        errors = validate_ticket_config(data)
+        if errors:
+            raise ValidationError(errors)
+
+
+class SimilarTicketQuerySchema(Schema):
+    title = fields.Str(required=True)
+    description = fields.Str(required=False)
+    limit = fields.Int(load_default=5, validate=validate.Range(min=1, max=50))
+    exclude = fields.Int(required=False, description="ID of a ticket to leave out, e.g. the one being edited")
+
+
+class SimilarTicketSchema(Schema):
+    ticket = fields.Nested(PlainTicketSchema, dump_only=True)
+    score = fields.Float(dump_only=True, description="Jaccard similarity of the texts, 0 to 1")
+
+
+class TicketChangeSchema(PlainTicketSchema):
+    created_by = fields.Int(dump_only=True)
+    assigned_to = fields.Int(allow_none=True, dump_only=True)
+    approved_by = fields.Int(allow_none=True, dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+
+class CommentChangeSchema(PlainCommentSchema):
+    updated_at = fields.DateTime(dump_only=True)
+
+
+class AttachmentChangeSchema(PlainAttachmentSchema):
+    updated_at = fields.DateTime(dump_only=True)
+
+
+class TombstoneSchema(Schema):
+    entity = fields.Str(dump_only=True)  # 'tickets', 'comments' or 'attachments'
+    entity_id = fields.Int(dump_only=True)
+    ticket_id = fields.Int(allow_none=True, dump_only=True)
+    deleted_at = fields.DateTime(dump_only=True)
+
+
+class TicketChangesQuerySchema(Schema):
+    since = fields.Str(required=False, description="Cursor returned by the previous call; omit for a full sync")
+
+
+class TicketChangesSchema(Schema):
+    cursor = fields.Str(dump_only=True)
+    tickets = fields.List(fields.Nested(TicketChangeSchema), dump_only=True)
+    comments = fields.List(fields.Nested(CommentChangeSchema), dump_only=True)
+    attachments = fields.List(fields.Nested(AttachmentChangeSchema), dump_only=True)
+    deleted = fields.List(fields.Nested(TombstoneSchema), dump_only=True)
+
+
+class EventStreamQuerySchema(Schema):
+    assignee = fields.Int(required=False, description="Only events for tickets assigned to this user")
+    status = fields.Str(required=False, description="Only events for tickets in this status")
+
+
+class CommentPageQuerySchema(Schema):
+    cursor = fields.Str(required=False, description="next_cursor of the previous page")
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+    order = fields.Str(load_default="asc", validate=validate.OneOf(["asc", "desc"]),
+                       description="'asc' for oldest first, 'desc' for newest first")
+
+
+class CommentPageSchema(Schema):
+    comments = fields.List(fields.Nested(PlainCommentSchema), dump_only=True)
+    users = fields.Dict(keys=fields.Str(), values=fields.Nested(PlainUserSchema), dump_only=True)
+    comment_count = fields.Int(dump_only=True)
+    next_cursor = fields.Str(allow_none=True, dump_only=True)
+
 
 class LoginSchema(Schema):
     username = fields.Str(required=True)
@@ -114,6 +202,19 @@ class ConfigMasterSchema(Schema):
     parent = fields.Str(allow_none=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
+    version = fields.Int(dump_only=True)
+
+class ConfigTreeNodeSchema(Schema):
+    id = fields.Int(dump_only=True)
+    type = fields.Str(dump_only=True)
+    value = fields.Str(dump_only=True)
+    label = fields.Str(dump_only=True)
+    color = fields.Str(allow_none=True, dump_only=True)
+    children = fields.List(fields.Nested(lambda: ConfigTreeNodeSchema()), dump_only=True)
+
+
+class ConfigTreeSchema(Schema):
+    types = fields.Dict(keys=fields.Str(), values=fields.List(fields.Nested(ConfigTreeNodeSchema)), dump_only=True)
 
 class ConfigMasterUpdateSchema(Schema):
     type = fields.Str()
@@ -127,3 +228,47 @@ class MailSchema(Schema):
     recipients = fields.List(fields.Email, required=True, description="List of recipient email addresses")
     body = fields.Str(description="Body of the email")
     sender = fields.Email(description="Sender email address (optional; defaults to the app's default sender)")
+
+
+class WorkloadSchema(Schema):
+    user_id = fields.Int(dump_only=True)
+    username = fields.Str(dump_only=True)
+    open_tickets = fields.Int(dump_only=True)
+    categories = fields.Dict(keys=fields.Str(), values=fields.Int(), dump_only=True)
+
+
+class ApprovalPageQuerySchema(Schema):
+    cursor = fields.Str(required=False, description="next_cursor of the previous page")
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+
+
+class ApprovalTicketSchema(PlainTicketSchema):
+    created_by = fields.Int(dump_only=True)
+    approved_by = fields.Int(allow_none=True, dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+
+
+class ApprovalPageSchema(Schema):
+    tickets = fields.List(fields.Nested(ApprovalTicketSchema), dump_only=True)
+    next_cursor = fields.Str(allow_none=True, dump_only=True)
+
+
+class ApprovalDecisionSchema(Schema):
+    ticket_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=200))
+    decision = fields.Str(required=True, validate=validate.OneOf(["approve", "reject"]))
+    reason = fields.Str(required=False, validate=validate.Length(max=150))
+
+
+class ExportRequestSchema(Schema):
+    full = fields.Bool(load_default=False, description="Export every row instead of the changes since the last run")
+
+
+class ExportStatusSchema(Schema):
+    running = fields.Bool(dump_only=True)
+    run_id = fields.Str(allow_none=True, dump_only=True)
+    format = fields.Str(allow_none=True, dump_only=True)
+    full = fields.Bool(allow_none=True, dump_only=True)
+    since = fields.Str(allow_none=True, dump_only=True)
+    cursor = fields.Str(allow_none=True, dump_only=True)
+    rows = fields.Dict(keys=fields.Str(), values=fields.Int(), dump_only=True)
+    files = fields.List(fields.Str(), dump_only=True)
@@ -0,0 +1,151 @@
+"""
+similarity.py
+
+In-process index of recent tickets for spotting likely duplicates.
+
+Each ticket is reduced to its shingles, the set of lowercased words of its
+title and description. An inverted index maps every shingle to the tickets
+containing it, so a query only looks at the tickets sharing a shingle with
+it, then ranks them by the Jaccard similarity of the shingle sets. Shingles found in more than MAX_SHARE of the indexed
+tickets ('the', 'please', 'error', ...) say little and are skipped when
+collecting candidates.
+
+Only the SIMILARITY_WINDOW most recent tickets are indexed, which bounds the
+memory used. The index is built from the database on first use and then
+caught up from the indexed tickets.updated_at column, at most every
+SIMILARITY_CHECK_SECONDS, so it sees tickets created or edited by every
+worker. Deleted tickets drop out when their rows are not found.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from db import db
+from models import TicketModel
+
+# Shingles in more of the indexed tickets than this share are not used to find candidates
+MAX_SHARE = 0.2
+# ... unless the index is so small that the share would be meaningless
+MIN_POSTINGS = 50
+# Tickets scored exactly per requested result, picked by the number of shingles they share
+CANDIDATES_PER_RESULT = 20
+# Characters of the description that are indexed
+DESCRIPTION_CHARS = 2000
+
+WORD_RE = re.compile(r"\w{2,}")
+
+
+def shingles(title, description):
+    """The set of words of a ticket's text."""
+    return frozenset(WORD_RE.findall(f"{title or ''} {(description or '')[:DESCRIPTION_CHARS]}".lower()))
+
+
+class SimilarityIndex:
+    """Shingle sets of recent tickets and the inverted index over them."""
+
+    def __init__(self, window, check_interval, overlap):
+        self.window = window
+        self.check_interval = check_interval
+        self.overlap = overlap
+        self.tickets = OrderedDict()  # ticket id -> shingles, oldest first
+        self.postings = {}  # shingle -> ids of the tickets containing it
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _add(self, ticket_id, ticket_shingles):
+        # An edited ticket keeps its place in the eviction order
+        self._unlink(ticket_id, self.tickets.get(ticket_id, ()))
+        self.tickets[ticket_id] = ticket_shingles
+        for shingle in ticket_shingles:
+            self.postings.setdefault(shingle, set()).add(ticket_id)
+        while len(self.tickets) > self.window:
+            self._remove(next(iter(self.tickets)))
+
+    def _remove(self, ticket_id):
+        self._unlink(ticket_id, self.tickets.pop(ticket_id, ()))
+
+    def _unlink(self, ticket_id, ticket_shingles):
+        for shingle in ticket_shingles:
+            ids = self.postings[shingle]
+            ids.discard(ticket_id)
+            if not ids:
+                del self.postings[shingle]
+
+    def discard(self, ticket_ids):
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self._remove(ticket_id)
+
+    def refresh(self):
+        """Build the index, or add the tickets changed since the last refresh."""
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._checked_at < self.check_interval:
+            return self
+        with self._lock:
+            if self._synced_at is not None and now - self._checked_at < self.check_interval:
+                return self
+            # Naive like the DateTime columns
+            db_now = db.session.execute(select(func.current_timestamp())).scalar().replace(tzinfo=None)
+            query = select(TicketModel.id, TicketModel.title, TicketModel.description)
+            if self._synced_at is None:
+                # The most recent tickets, added oldest first so eviction order follows ids
+                query = query.order_by(TicketModel.id.desc()).limit(self.window)
+                rows = reversed(db.session.execute(query).all())
+            else:
+                # Trails the last sync so rows committed late by concurrent transactions are not missed
+                query = query.where(TicketModel.updated_at >= self._synced_at - self.overlap)
+                oldest = next(iter(self.tickets), 0) if len(self.tickets) >= self.window else 0
+                rows = db.session.execute(query.where(TicketModel.id >= oldest).order_by(TicketModel.id)).all()
+            for ticket_id, title, description in rows:
+                self._add(ticket_id, shingles(title, description))
+            self._synced_at = db_now
+            self._checked_at = now
+        return self
+
+    def similar(self, title, description, limit, threshold, exclude=None):
+        """[(ticket id, similarity)] of the best matches of the text, most similar first."""
+        query_shingles = shingles(title, description)
+        with self._lock:
+            max_postings = max(MIN_POSTINGS, int(len(self.tickets) * MAX_SHARE))
+            shared = Counter()
+            for shingle in query_shingles:
+                ids = self.postings.get(shingle)
+                if ids and len(ids) <= max_postings:
+                    shared.update(ids)
+            shared.pop(exclude, None)
+
+            # Only the tickets sharing the most informative shingles are scored exactly
+            matches = []
+            for ticket_id, _ in shared.most_common(limit * CANDIDATES_PER_RESULT):
+                ticket_shingles = self.tickets[ticket_id]
+                common = len(query_shingles & ticket_shingles)
+                score = common / (len(query_shingles) + len(ticket_shingles) - common)
+                if score >= threshold:
+                    matches.append((ticket_id, score))
+        matches.sort(key=lambda match: (-match[1], -match[0]))
+        return matches[:limit]
+
+
+def init_similarity(app):
+    app.extensions["similarity_index"] = SimilarityIndex(
+        app.config["SIMILARITY_WINDOW"],
+        app.config["SIMILARITY_CHECK_SECONDS"],
+        timedelta(seconds=app.config["CHANGES_OVERLAP_SECONDS"]),
+    )
+
+
+def find_similar(title, description=None, limit=5, exclude=None):
+    """[(ticket, similarity)] of recent tickets likely to duplicate the given text."""
+    index = current_app.extensions["similarity_index"].refresh()
+    matches = index.similar(title, description, limit, current_app.config["SIMILARITY_THRESHOLD"], exclude)
+    if not matches:
+        return []
+    tickets = {ticket.id: ticket for ticket in TicketModel.query.filter(TicketModel.id.in_(dict(matches))).all()}
+    index.discard([ticket_id for ticket_id, _ in matches if ticket_id not in tickets])
+    return [(tickets[ticket_id], score) for ticket_id, score in matches if ticket_id in tickets]
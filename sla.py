@@ -0,0 +1,188 @@
+"""
+sla.py
+
+SLA deadlines for tickets and escalation of the overdue ones.
+
+Policies are config_master rows of type 'sla' whose value is a priority
+('high') or a priority and category ('high:network') and whose label is the
+number of hours a ticket may stay open. When a ticket is created, or its
+priority, category or status changes, its deadline ``due_at`` is set to
+created_at plus those hours.
+
+``escalate_at`` mirrors ``due_at`` while the ticket is open and not yet
+escalated, and is NULL otherwise, so its index only holds tickets that may
+still breach. Every SLA_CHECK_INTERVAL seconds a scheduler thread fetches
+the tickets with ``escalate_at <= now`` -- a range scan of that index, whose
+cost depends on the number of breaching tickets, not on the table size --
+and marks them escalated. events.py publishes a ``ticket.escalated`` event
+for each of them like for any other ticket change.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+
+from config_index import WILDCARD, get_config_index
+from db import db, writing
+from models import TicketModel
+
+logger = logging.getLogger(__name__)
+
+# A change to any of these moves the deadline
+SLA_FIELDS = ("priority", "category", "status")
+
+
+def _db_now(session):
+    # Naive like the DateTime columns; Postgres returns the session's local time with an offset
+    return session.execute(select(func.current_timestamp())).scalar().replace(tzinfo=None)
+
+
+def apply_sla(ticket, index, now, closed_statuses):
+    """Set the SLA columns of ``ticket`` from the policies in ``index``."""
+    if ticket.status in closed_statuses:
+        ticket.escalate_at = None
+        return
+
+    hours = index.due_hours(ticket.priority, ticket.category or WILDCARD) if index is not None else None
+    if hours is None:
+        ticket.due_at = ticket.escalate_at = None
+        return
+
+    ticket.due_at = (ticket.created_at or now) + timedelta(hours=hours)
+    if ticket.due_at > now:
+        ticket.escalated_at = None  # A new deadline can be escalated again
+    ticket.escalate_at = None if ticket.escalated_at else ticket.due_at
+
+
+def _sla_fields_changed(ticket):
+    attrs = inspect(ticket).attrs
+    return any(getattr(attrs, field).history.has_changes() for field in SLA_FIELDS)
+
+
+@event.listens_for(db.session, "before_flush")
+def update_sla(session, flush_context, instances):
+    if not has_app_context() or "TICKET_CLOSED_STATUSES" not in current_app.config:
+        return
+    tickets = [obj for obj in session.new if isinstance(obj, TicketModel)]
+    tickets += [obj for obj in session.dirty if isinstance(obj, TicketModel) and _sla_fields_changed(obj)]
+    if not tickets:
+        return
+
+    index = get_config_index()
+    now = _db_now(session)
+    closed_statuses = current_app.config["TICKET_CLOSED_STATUSES"]
+    for ticket in tickets:
+        apply_sla(ticket, index, now, closed_statuses)
+
+
+def escalate_breaches(app):
+    """Mark every ticket past its deadline as escalated; returns how many were."""
+    batch_size = app.config["SLA_BATCH_SIZE"]
+    escalated = 0
+    with app.app_context():
+        try:
+            # Most checks find nothing; look in a read transaction before taking the write lock
+            now = _db_now(db.session)
+            due = db.session.execute(select(TicketModel.id).where(TicketModel.escalate_at <= now).limit(1)).first()
+            db.session.commit()
+            with writing():
+                while due is not None:
+                    now = _db_now(db.session)
+                    # SKIP LOCKED lets the schedulers of several workers share the work on Postgres;
+                    # SQLite serializes them with BEGIN IMMEDIATE instead (see db.configure_sqlite)
+                    tickets = (
+                        TicketModel.query.filter(TicketModel.escalate_at <= now)
+                        .order_by(TicketModel.escalate_at)
+                        .limit(batch_size)
+                        .with_for_update(skip_locked=True)
+                        .all()
+                    )
+                    for ticket in tickets:
+                        ticket.escalated_at = now
+                        ticket.escalate_at = None
+                    db.session.commit()
+                    escalated += len(tickets)
+                    if len(tickets) < batch_size:
+                        break
+        finally:
+            db.session.remove()
+
+    if escalated:
+        logger.info(f"Escalated {escalated} tickets past their SLA deadline.")
+    return escalated
+
+
+def recompute_sla(app):
+    """Recompute the deadlines of all open tickets, e.g. after changing policies."""
+    batch_size = app.config["SLA_BATCH_SIZE"]
+    closed_statuses = app.config["TICKET_CLOSED_STATUSES"]
+    updated = 0
+    last_id = 0
+    with app.app_context():
+        try:
+            index = get_config_index()
+            db.session.commit()  # Ends the read of the index so the batches begin as writes
+            with writing():
+                while True:
+                    tickets = (
+                        TicketModel.query.filter(TicketModel.id > last_id)
+                        .filter(TicketModel.status.not_in(closed_statuses))
+                        .order_by(TicketModel.id)
+                        .limit(batch_size)
+                        .all()
+                    )
+                    if not tickets:
+                        break
+                    now = _db_now(db.session)
+                    for ticket in tickets:
+                        apply_sla(ticket, index, now, closed_statuses)
+                    db.session.commit()
+                    updated += len(tickets)
+                    last_id = tickets[-1].id
+        finally:
+            db.session.remove()
+    return updated
+
+
+def _check_forever(app):
+    interval = app.config["SLA_CHECK_INTERVAL"]
+    while True:
+        time.sleep(interval)
+        try:
+            escalate_breaches(app)
+        except Exception as e:
+            logger.error(f"SLA check failed: {e}")
+
+
+def init_sla(app):
+    """Registers the SLA commands and the periodic escalation check of ``app``."""
+
+    @app.cli.command("sla-check")
+    def sla_check_command():
+        """Escalate tickets past their SLA deadline."""
+        click.echo(f"Escalated {escalate_breaches(app)} tickets.")
+
+    @app.cli.command("sla-recompute")
+    def sla_recompute_command():
+        """Recompute SLA deadlines of all open tickets."""
+        click.echo(f"Recomputed deadlines of {recompute_sla(app)} tickets.")
+
+    if app.config["SLA_CHECK_INTERVAL"] <= 0:
+        return
+
+    lock = threading.Lock()
+    started = []
+
+    @app.before_request
+    def start_sla_scheduler():
+        # Started from the first request so CLI commands never spawn the thread
+        if started:
+            return
+        with lock:
+            if not started:
+                threading.Thread(target=_check_forever, args=(app,), name="sla-scheduler", daemon=True).start()
+                started.append(True)
@@ -0,0 +1,172 @@
+"""
+storage.py
+
+Where attachment files are kept.
+
+Attachments are addressed by a key, the relative path stored in
+``attachments.filepath`` (e.g. ``uploads/12/<random>/report.pdf``). The
+backend chosen by STORAGE_BACKEND maps keys to actual storage:
+
+- ``local``: files below STORAGE_LOCAL_ROOT on this machine's disk. Only
+  correct with a single instance or a shared volume.
+- ``s3``: objects in the S3_BUCKET bucket of any S3-compatible object store
+  (AWS, MinIO, ...; set S3_ENDPOINT_URL for the latter). Downloads are
+  redirected to short-lived presigned URLs, so file bytes never pass through
+  the workers. Requires boto3.
+
+Both backends expose the same small interface: save, open, stat, delete,
+iter_keys, local_path and url.
+"""
+import os
+import shutil
+
+from flask import current_app
+
+
+class StorageError(Exception):
+    """A file could not be read from or written to storage."""
+
+
+class LocalStorage:
+    """Keys are paths relative to ``root`` on the local filesystem."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def save(self, key, stream):
+        path = self.local_path(key)
+        # Write to a temporary file first so readers never see a partial file
+        temporary = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary, "wb") as target:
+                shutil.copyfileobj(stream, target)
+            os.replace(temporary, path)
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def open(self, key):
+        try:
+            return open(self.local_path(key), "rb")
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def stat(self, key):
+        """(size in bytes, modification time as a POSIX timestamp), or None if missing."""
+        try:
+            stat = os.stat(self.local_path(key))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    def delete(self, key):
+        path = self.local_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        # Drop directories left empty, e.g. the per-upload directory
+        directory = os.path.dirname(path)
+        while directory and os.path.abspath(directory) != os.path.abspath(self.root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def iter_keys(self, prefix):
+        """Yield (key, modification timestamp) of every file below ``prefix``."""
+        for directory, _, filenames in os.walk(self.local_path(prefix)):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    modified = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield os.path.relpath(path, self.root).replace("\\", "/"), modified
+
+    def url(self, key, filename=None):
+        """Local files are served by the app itself."""
+        return None
+
+
+class S3Storage:
+    """Keys are object keys in ``bucket`` of an S3-compatible store."""
+
+    def __init__(self, bucket, url_expires, **client_options):
+        # boto3 takes a noticeable part of a second to import; only s3 deployments pay for it
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("The s3 storage backend requires boto3.")
+        self.bucket = bucket
+        self.url_expires = url_expires
+        self.client = boto3.client("s3", **client_options)
+
+    def local_path(self, key):
+        return None
+
+    def save(self, key, stream):
+        try:
+            self.client.upload_fileobj(stream, self.bucket, key)
+        except Exception as e:
+            raise StorageError(str(e)) from e
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except Exception as e:
+            raise StorageError(str(e)) from e
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError:
+            return None
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_keys(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip("/") + "/"):
+            for item in page.get("Contents", ()):
+                yield item["Key"], item["LastModified"].timestamp()
+
+    def url(self, key, filename=None):
+        """A presigned GET URL for ``key``, valid for ``url_expires`` seconds."""
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_expires)
+
+
+def init_storage(app):
+    """Creates the storage backend of ``app`` from its configuration."""
+    backend = app.config["STORAGE_BACKEND"]
+    if backend == "local":
+        storage = LocalStorage(app.config["STORAGE_LOCAL_ROOT"])
+    elif backend == "s3":
+        options = {
+            "endpoint_url": app.config["S3_ENDPOINT_URL"],
+            "region_name": app.config["S3_REGION"],
+            "aws_access_key_id": app.config["S3_ACCESS_KEY_ID"],
+            "aws_secret_access_key": app.config["S3_SECRET_ACCESS_KEY"],
+        }
+        # Unset options fall back to boto3's usual environment and config files
+        storage = S3Storage(
+            app.config["S3_BUCKET"],
+            app.config["STORAGE_URL_EXPIRES"],
+            **{name: value for name, value in options.items() if value},
+        )
+    else:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND '{backend}'.")
+    app.extensions["storage"] = storage
+
+
+def get_storage():
+    return current_app.extensions["storage"]
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+from passlib.hash import pbkdf2_sha256
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from db import db  # noqa: E402
+from models import UserModel  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app("sqlite://")
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            UserModel(username="admin@example.com", password=pbkdf2_sha256.hash("pw"), role="admin", approver=True),
+            UserModel(username="user@example.com", password=pbkdf2_sha256.hash("pw"), role="user", approver=False),
+        ])
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, username):
+    response = client.post("/login", json={"username": username, "password": "pw"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client, "admin@example.com")
+
+
+@pytest.fixture
+def user_headers(client):
+    return login(client, "user@example.com")
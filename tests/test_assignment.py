@@ -0,0 +1,129 @@
+import pytest
+
+from assignment import WorkloadIndex
+from db import db
+from models import TicketModel, UserModel
+
+
+@pytest.fixture
+def index(app):
+    """The app's workload index, built once and then only kept current by commits."""
+    with app.app_context():
+        db.session.add_all([
+            UserModel(username="agent1@example.com", password="x", role="agent"),
+            UserModel(username="agent2@example.com", password="x", role="agent"),
+        ])
+        db.session.commit()
+        index = app.extensions["workload_index"].refresh()
+        index.rebuild_interval = 3600
+        yield index
+
+
+def rebuilt(app):
+    """The workload a fresh index builds from the tickets table."""
+    return WorkloadIndex(app.config["ASSIGNMENT_ROLES"], app.config["TICKET_CLOSED_STATUSES"], 0).refresh().workload()
+
+
+def ticket(assigned_to, category="Hardware", status="open"):
+    return TicketModel(title="Printer", description="Out of toner", status=status, priority="low",
+                       category=category, created_by=1, assigned_to=assigned_to)
+
+
+def agent_ids():
+    return db.session.execute(
+        db.select(UserModel.id).where(UserModel.role == "agent").order_by(UserModel.id)
+    ).scalars().all()
+
+
+def test_commits_keep_the_workload_equal_to_a_rebuild(app, index):
+    first, second = agent_ids()
+    tickets = [ticket(first), ticket(first, "Software"), ticket(second), ticket(None), ticket(second, status="closed")]
+    db.session.add_all(tickets)
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+
+    tickets[0].assigned_to = second  # Reassign
+    tickets[1].category = "Hardware"  # Re-categorise
+    tickets[2].status = "resolved"  # Close
+    tickets[4].status = "open"  # Reopen
+    tickets[3].assigned_to = first  # Assign
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+
+    db.session.delete(tickets[1])
+    tickets[0].category = None
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+    assert not index._stale
+
+
+def test_several_flushes_of_one_transaction_count_once(app, index):
+    first, second = agent_ids()
+    created = ticket(first)
+    db.session.add(created)
+    db.session.flush()
+    created.assigned_to = second
+    db.session.flush()
+    created.category = "Software"
+    created.status = "closed"
+    db.session.flush()
+    created.status = "open"
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+
+    db.session.delete(created)
+    db.session.flush()
+    db.session.add(ticket(first))
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+
+
+def test_rolled_back_changes_are_discarded(app, index):
+    first, second = agent_ids()
+    kept = ticket(first)
+    db.session.add(kept)
+    db.session.commit()
+    before = index.workload()
+
+    kept.assigned_to = second
+    db.session.add(ticket(second))
+    db.session.flush()
+    db.session.rollback()
+    assert index.workload() == before == rebuilt(app)
+
+    kept.status = "closed"
+    db.session.commit()
+    assert index.workload() == rebuilt(app)
+
+
+def test_agent_changes_invalidate_the_index(app, index):
+    first, _ = agent_ids()
+    db.session.add(ticket(first))
+    db.session.commit()
+
+    db.session.add(UserModel(username="agent3@example.com", password="x", role="agent"))
+    db.session.commit()
+    assert index._stale
+    assert index.refresh().workload() == rebuilt(app)
+    assert [agent["username"] for agent in index.workload()][-1] == "agent3@example.com"
+
+
+def test_workload_endpoint_follows_ticket_requests(app, client, admin_headers, index):
+    first, second = agent_ids()
+    created = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low",
+              "created_by": 1, "assigned_to": first},
+        headers=admin_headers,
+    ).json
+    client.put(f"/ticket/{created['id']}", json={"assigned_to": second}, headers=admin_headers)
+    assert client.get("/assignment/workload", headers=admin_headers).json == rebuilt(app)
+
+    client.put(f"/ticket/{created['id']}", json={"status": "closed"}, headers=admin_headers)
+    assert client.get("/assignment/workload", headers=admin_headers).json == rebuilt(app)
+
+    client.put(f"/ticket/{created['id']}", json={"status": "open"}, headers=admin_headers)
+    client.delete(f"/ticket/{created['id']}", headers=admin_headers)
+    workload = client.get("/assignment/workload", headers=admin_headers).json
+    assert workload == rebuilt(app)
+    assert all(agent["open_tickets"] == 0 for agent in workload)
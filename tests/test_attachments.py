@@ -0,0 +1,90 @@
+import io
+import os
+import time
+
+import pytest
+
+from attachment_store import sweep_attachments
+from db import db
+from models import AttachmentModel, TicketModel
+from storage import LocalStorage
+
+OLD_KEY = "uploads/1/0123456789abcdef0123456789abcdef/report.pdf"
+LEGACY_KEY = "uploads/report.pdf"
+
+
+@pytest.fixture
+def storage(app, tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    app.extensions["storage"] = storage
+    app.config["ATTACHMENT_ORPHAN_SECONDS"] = 60
+    with app.app_context():
+        db.session.add(TicketModel(title="Printer", description="Out of toner", status="open", priority="low",
+                                   created_by=2))
+        db.session.commit()
+    return storage
+
+
+def write(storage, key, age=3600):
+    path = storage.local_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"data")
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+
+
+def add_attachment(app, key):
+    with app.app_context():
+        attachment = AttachmentModel(ticket_id=1, filename=os.path.basename(key), filepath=key)
+        db.session.add(attachment)
+        db.session.commit()
+        return attachment.id
+
+
+def test_sweep_removes_only_unreferenced_upload_keys(app, storage):
+    kept = "uploads/1/fedcba9876543210fedcba9876543210/kept.txt"
+    add_attachment(app, kept)
+    for key in (kept, OLD_KEY, OLD_KEY + ".preview.jpg", "uploads/dummy_file", "uploads/.gitkeep",
+                "uploads/1/notes.txt", LEGACY_KEY):
+        write(storage, key)
+    recent = "uploads/1/00000000000000000000000000000000/in-flight.txt"
+    write(storage, recent, age=0)
+
+    assert sweep_attachments(app) == (0, 2)
+
+    remaining = {key for key, _ in storage.iter_keys("uploads")}
+    assert remaining == {kept, recent, "uploads/dummy_file", "uploads/.gitkeep", "uploads/1/notes.txt", LEGACY_KEY}
+
+
+def upload(client, headers, attachment_id):
+    return client.post(
+        f"/ticket/1/attachments/{attachment_id}/upload",
+        data={"file": (io.BytesIO(b"new"), "new.pdf")},
+        headers=headers,
+        content_type="multipart/form-data",
+    )
+
+
+def test_replacing_a_shared_file_keeps_it_for_the_other_rows(app, client, user_headers, storage):
+    write(storage, LEGACY_KEY)
+    first = add_attachment(app, LEGACY_KEY)
+    second = add_attachment(app, LEGACY_KEY)
+
+    assert upload(client, user_headers, first).status_code == 201
+    assert os.path.exists(storage.local_path(LEGACY_KEY))
+
+    assert upload(client, user_headers, second).status_code == 201
+    assert not os.path.exists(storage.local_path(LEGACY_KEY))
+
+
+def test_deleting_a_shared_attachment_keeps_the_file(app, client, user_headers, storage):
+    write(storage, LEGACY_KEY)
+    first = add_attachment(app, LEGACY_KEY)
+    second = add_attachment(app, LEGACY_KEY)
+
+    assert client.delete(f"/ticket/1/attachment/{first}", headers=user_headers).status_code == 200
+    assert os.path.exists(storage.local_path(LEGACY_KEY))
+
+    assert client.delete(f"/ticket/1/attachment/{second}", headers=user_headers).status_code == 200
+    assert not os.path.exists(storage.local_path(LEGACY_KEY))
@@ -0,0 +1,25 @@
+from app import create_app
+from auth import load_user
+from db import db
+from models import UserModel
+
+
+def test_each_app_has_its_own_user_cache(app, monkeypatch):
+    monkeypatch.setenv("USER_CACHE_SIZE", "7")
+    monkeypatch.setenv("USER_CACHE_TTL", "5")
+    other = create_app("sqlite://")
+    with other.app_context():
+        db.create_all()
+        db.session.add(UserModel(username="admin@example.com", password="x", role="agent"))
+        db.session.commit()
+
+    with app.app_context():
+        assert load_user("admin@example.com").role == "admin"
+    with other.app_context():
+        assert load_user("admin@example.com").role == "agent"
+        cache = other.extensions["user_cache"]
+        assert (cache.maxsize, cache.ttl) == (7, 5)
+        db.session.remove()
+        db.drop_all()
+    assert app.extensions["user_cache"] is not other.extensions["user_cache"]
+    assert app.extensions["user_cache"].maxsize == app.config["USER_CACHE_SIZE"]
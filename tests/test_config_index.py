@@ -0,0 +1,52 @@
+from sqlalchemy import text
+
+from config_index import ConfigIndex
+from db import db
+from models import ConfigMasterModel
+
+
+def test_index_sees_edits_made_by_another_worker_in_the_same_second(app):
+    with app.app_context():
+        db.session.add(ConfigMasterModel(type="category", value="Hardware", label="Hardware"))
+        db.session.commit()
+        index = ConfigIndex(check_interval=0).refresh()
+        assert index.is_valid("category", "Hardware")
+
+        # Another worker's edit: no local commit invalidates the index, and updated_at may not move
+        db.session.execute(text("UPDATE config_master SET value = 'Software', version = version + 1"))
+        db.session.commit()
+
+        index.refresh()
+        assert index.is_valid("category", "Software")
+        assert not index.is_valid("category", "Hardware")
+
+
+def test_partial_update_checks_the_subcategory_against_the_stored_category(app, client, user_headers):
+    with app.app_context():
+        db.session.add_all([
+            ConfigMasterModel(type="category", value="Hardware", label="Hardware"),
+            ConfigMasterModel(type="category", value="Software", label="Software"),
+            ConfigMasterModel(type="subcategory", value="Printer", label="Printer", parent="Hardware"),
+            ConfigMasterModel(type="subcategory", value="Email", label="Email", parent="Software"),
+        ])
+        db.session.commit()
+    ticket = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low",
+              "category": "Hardware", "subcategory": "Printer", "created_by": 2},
+        headers=user_headers,
+    ).json
+
+    response = client.put(f"/ticket/{ticket['id']}", json={"subcategory": "Email"}, headers=user_headers)
+    assert response.status_code == 422
+    assert "subcategory" in response.json["errors"]["json"]
+    assert client.get(f"/ticket/{ticket['id']}", headers=user_headers).json["subcategory"] == "Printer"
+
+    response = client.put(f"/ticket/{ticket['id']}", json={"category": "Software", "subcategory": "Email"},
+                          headers=user_headers)
+    assert response.status_code == 200
+    assert response.json["subcategory"] == "Email"
+
+
+def test_updating_a_missing_ticket_is_not_found(client, user_headers):
+    assert client.put("/ticket/99", json={"title": "Scanner"}, headers=user_headers).status_code == 404
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import func, select, update
+
+from app import create_app
+from conftest import login
+from db import db
+from events import get_broker
+from models import EventModel, UserModel
+
+
+def create_ticket(client, headers, title="Printer"):
+    response = client.post(
+        "/ticket",
+        json={"title": title, "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json
+
+
+def age_events(app, seconds):
+    with app.app_context():
+        db.session.execute(update(EventModel).values(created_at=datetime.utcnow() - timedelta(seconds=seconds)))
+        db.session.commit()
+
+
+def event_ids(app):
+    with app.app_context():
+        return db.session.execute(select(EventModel.id).order_by(EventModel.id)).scalars().all()
+
+
+def test_writers_prune_events_without_subscribers(app, client, user_headers):
+    for number in range(5):
+        create_ticket(client, user_headers, f"Ticket {number}")
+    assert len(event_ids(app)) == 5
+    age_events(app, 3600)
+
+    app.config["EVENTS_RETENTION_SECONDS"] = 0
+    create_ticket(client, user_headers, "Scanner")
+
+    with app.app_context():
+        assert get_broker()._listener is None
+        assert len(event_ids(app)) == 1
+        newest = db.session.execute(select(EventModel.payload)).scalar()
+    assert '"ticket.created"' in newest
+
+
+def test_writers_prune_at_most_once_per_retention_period(app, client, user_headers):
+    create_ticket(client, user_headers)
+    age_events(app, 3600)
+    create_ticket(client, user_headers, "Scanner")
+    assert len(event_ids(app)) == 2
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    app = create_app(f"sqlite:///{tmp_path / 'events.db'}")
+    app.config["EVENTS_POLL_INTERVAL"] = 0.05
+    with app.app_context():
+        db.create_all()
+        db.session.add(UserModel(username="user@example.com", password=pbkdf2_sha256.hash("pw"), role="user"))
+        db.session.add(UserModel(username="other@example.com", password=pbkdf2_sha256.hash("pw"), role="user"))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_subscribers_receive_events_while_writers_prune(file_app):
+    client = file_app.test_client()
+    headers = login(client, "user@example.com")
+    create_ticket(client, headers, "Old")
+    age_events(file_app, 3600)
+
+    with file_app.app_context():
+        subscriber = get_broker().subscribe()
+    file_app.config["EVENTS_RETENTION_SECONDS"] = 0
+    ticket = create_ticket(client, headers, "New")
+
+    payload = subscriber.get(timeout=5)
+    assert payload["type"] == "ticket.created"
+    assert payload["ticket_id"] == ticket["id"]
+    with file_app.app_context():
+        assert db.session.execute(select(func.count(EventModel.id))).scalar() == 1
+        get_broker().unsubscribe(subscriber)
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from db import db
+from idempotency import request_fingerprint
+from models import IdempotencyKeyModel, TicketModel
+
+TICKET = {"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2}
+
+
+def post_ticket(client, headers, key, json=TICKET):
+    return client.post("/ticket", json=json, headers={**headers, "Idempotency-Key": key})
+
+
+def count(app, model):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_retry_replays_the_stored_response(app, client, user_headers):
+    first = post_ticket(client, user_headers, "retry-1")
+    retry = post_ticket(client, user_headers, "retry-1")
+
+    assert first.status_code == retry.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+    assert count(app, TicketModel) == 1
+
+
+def test_key_reused_for_a_different_request_is_refused(app, client, user_headers):
+    assert post_ticket(client, user_headers, "reused").status_code == 201
+    response = post_ticket(client, user_headers, "reused", {**TICKET, "title": "Scanner"})
+    assert response.status_code == 422
+    assert count(app, TicketModel) == 1
+
+
+def test_keys_belong_to_one_user(app, client, user_headers, admin_headers):
+    assert post_ticket(client, user_headers, "shared").status_code == 201
+    response = post_ticket(client, admin_headers, "shared")
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert count(app, TicketModel) == 2
+
+
+def add_key(app, key, age):
+    """An unfinished request of user@example.com creating TICKET, started ``age`` seconds ago."""
+    with app.test_request_context("/ticket", method="POST", json=TICKET):
+        db.session.add(IdempotencyKeyModel(
+            user_id=2, key=key, request_hash=request_fingerprint(),
+            created_at=datetime.utcnow() - timedelta(seconds=age),
+        ))
+        db.session.commit()
+
+
+def test_retry_of_a_request_in_progress_conflicts(app, client, user_headers):
+    add_key(app, "running", age=0)
+    assert post_ticket(client, user_headers, "running").status_code == 409
+    assert count(app, TicketModel) == 0
+
+
+def test_abandoned_key_is_taken_over(app, client, user_headers):
+    add_key(app, "abandoned", age=app.config["IDEMPOTENCY_LOCK_SECONDS"] + 60)
+    assert post_ticket(client, user_headers, "abandoned").status_code == 201
+    assert post_ticket(client, user_headers, "abandoned").headers["Idempotent-Replayed"] == "true"
+    assert count(app, TicketModel) == 1
+
+
+def test_failed_requests_release_their_key(app, client, user_headers):
+    headers = {**user_headers, "Idempotency-Key": "failed"}
+    comment = {"ticket_id": 1, "user_id": 2, "content": "Hello"}
+    assert client.post("/ticket/1/comments", json=comment, headers=headers).status_code == 404
+    assert count(app, IdempotencyKeyModel) == 0
+
+    post_ticket(client, user_headers, "created")
+    response = client.post("/ticket/1/comments", json=comment, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
@@ -0,0 +1,61 @@
+from sqlalchemy import event, text
+
+from db import db
+
+
+def create_ticket(client, headers):
+    """The GET response of a new ticket, carrying its ETag."""
+    created = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2},
+        headers=headers,
+    ).json
+    return client.get(f"/ticket/{created['id']}", headers=headers)
+
+
+def test_matching_if_match_updates_the_ticket(client, user_headers):
+    created = create_ticket(client, user_headers)
+    response = client.put(
+        f"/ticket/{created.json['id']}", json={"title": "Scanner"},
+        headers={**user_headers, "If-Match": created.headers["ETag"]},
+    )
+    assert response.status_code == 200
+    assert response.json["title"] == "Scanner"
+    assert response.json["version"] == created.json["version"] + 1
+    assert response.headers["ETag"].startswith(f'"{response.json["version"]}-')
+
+
+def test_stale_if_match_answers_412_with_the_current_ticket(client, user_headers):
+    created = create_ticket(client, user_headers)
+    ticket_id = created.json["id"]
+    client.put(f"/ticket/{ticket_id}", json={"title": "Scanner"}, headers=user_headers)
+
+    response = client.put(
+        f"/ticket/{ticket_id}", json={"title": "Fax"}, headers={**user_headers, "If-Match": created.headers["ETag"]}
+    )
+    assert response.status_code == 412
+    assert response.json["title"] == "Scanner"
+    assert response.json["version"] == created.json["version"] + 1
+    assert response.headers["ETag"].startswith(f'"{response.json["version"]}-')
+    assert client.get(f"/ticket/{ticket_id}", headers=user_headers).json["title"] == "Scanner"
+
+
+def test_concurrent_update_answers_412_with_the_current_ticket(app, client, user_headers):
+    created = create_ticket(client, user_headers).json
+
+    def concurrent_update(session, flush_context, instances):
+        # Stands in for another writer: the version moves between the view's read and its UPDATE ... WHERE version = ?
+        session.execute(text("UPDATE tickets SET title = 'Scanner', version = version + 1 WHERE id = :id"),
+                        {"id": created["id"]})
+
+    event.listen(db.session, "before_flush", concurrent_update)
+    try:
+        response = client.put(f"/ticket/{created['id']}", json={"title": "Fax"}, headers=user_headers)
+    finally:
+        event.remove(db.session, "before_flush", concurrent_update)
+
+    assert response.status_code == 412
+    # The stand-in's change shares our transaction, so it was rolled back with it
+    assert response.json["title"] == "Printer"
+    assert response.json["version"] == created["version"]
+    assert client.get(f"/ticket/{created['id']}", headers=user_headers).json["title"] == "Printer"
@@ -0,0 +1,73 @@
+import re
+
+from tests.conftest import login
+
+# Routes that are reachable without a token
+PUBLIC_ENDPOINTS = {"Users.UserLogin"}
+
+
+def create_ticket(client, headers):
+    response = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json
+
+
+def test_every_api_route_requires_a_token(app, client):
+    for rule in app.url_map.iter_rules():
+        view_class = getattr(app.view_functions[rule.endpoint], "view_class", None)
+        if view_class is None or rule.endpoint in PUBLIC_ENDPOINTS:
+            continue
+        path = re.sub(r"<(?:\w+:)?\w+>", "1", rule.rule)
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            response = client.open(path, method=method, json={})
+            assert response.status_code == 401, f"{method} {rule.rule} answered {response.status_code}"
+
+
+def test_anonymous_ticket_update_is_refused(client, user_headers):
+    ticket = create_ticket(client, user_headers)
+    response = client.put(f"/ticket/{ticket['id']}", json={"title": "Hijacked"})
+    assert response.status_code == 401
+    assert client.get(f"/ticket/{ticket['id']}", headers=user_headers).json["title"] == "Printer"
+
+
+def test_ticket_update_with_token(client, user_headers):
+    ticket = create_ticket(client, user_headers)
+    response = client.put(f"/ticket/{ticket['id']}", json={"title": "Scanner"}, headers=user_headers)
+    assert response.status_code == 200
+    assert response.json["title"] == "Scanner"
+
+
+def test_admin_only_routes(client, admin_headers, user_headers):
+    assert client.get("/export", headers=user_headers).status_code == 403
+    assert client.get("/export", headers=admin_headers).status_code == 200
+    assert client.delete("/user/1", headers=user_headers).status_code == 403
+
+
+def test_user_may_echo_back_their_own_role(client, user_headers):
+    response = client.put(
+        "/user/2",
+        json={"username": "user@example.com", "fullname": "Some User", "role": "user", "approver": False},
+        headers=user_headers,
+    )
+    assert response.status_code == 200
+    assert response.json["fullname"] == "Some User"
+
+
+def test_user_may_not_change_their_own_role(client, user_headers):
+    response = client.put("/user/2", json={"username": "user@example.com", "role": "admin"}, headers=user_headers)
+    assert response.status_code == 403
+    response = client.put("/user/2", json={"username": "user@example.com", "approver": True}, headers=user_headers)
+    assert response.status_code == 403
+
+
+def test_user_may_not_update_someone_else(client, user_headers):
+    assert client.put("/user/1", json={"username": "admin@example.com"}, headers=user_headers).status_code == 403
+
+
+def test_admin_may_change_roles(client, admin_headers):
+    response = client.put("/user/2", json={"username": "user@example.com", "role": "agent"}, headers=admin_headers)
+    assert response.status_code == 200
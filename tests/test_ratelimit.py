@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import func, select
+
+from db import db
+from models import RateLimitModel
+from ratelimit import DatabaseStore, MemoryStore, RateLimiter
+
+
+def limit_tickets(app, store, limit=3):
+    app.extensions["rate_limiter"] = RateLimiter(store, (600, 60), {"Tickets": (limit, 60)})
+
+
+@pytest.mark.parametrize("store", [MemoryStore, lambda: DatabaseStore(60)], ids=["memory", "database"])
+def test_requests_over_the_limit_get_429_with_rate_limit_headers(app, client, user_headers, store):
+    limit_tickets(app, store())
+
+    responses = [client.get("/ticket", headers=user_headers) for _ in range(4)]
+
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert [response.headers["RateLimit-Remaining"] for response in responses] == ["2", "1", "0", "0"]
+    refused = responses[-1]
+    assert refused.headers["RateLimit-Limit"] == "3"
+    assert refused.headers["RateLimit-Policy"] == "3;w=60"
+    assert 0 < int(refused.headers["RateLimit-Reset"]) <= 60
+    assert refused.headers["Retry-After"] == refused.headers["RateLimit-Reset"]
+    assert "Retry-After" not in responses[0].headers
+
+
+def test_database_store_keeps_counts_in_the_table(app, client, user_headers):
+    limit_tickets(app, DatabaseStore(60))
+    client.get("/ticket", headers=user_headers)
+    client.get("/ticket", headers=user_headers)
+    with app.app_context():
+        assert db.session.execute(select(func.sum(RateLimitModel.count))).scalar() == 2
+
+
+def test_limits_are_per_caller_and_route_group(app, client, user_headers, admin_headers):
+    limit_tickets(app, MemoryStore(), limit=1)
+    assert client.get("/ticket", headers=user_headers).status_code == 200
+    assert client.get("/ticket", headers=user_headers).status_code == 429
+
+    assert client.get("/ticket", headers=admin_headers).status_code == 200
+    other_group = client.get("/user/2", headers=user_headers)
+    assert other_group.status_code == 200
+    assert other_group.headers["RateLimit-Limit"] == "600"
+
+
+def test_sliding_window_does_not_allow_twice_the_limit_across_a_boundary():
+    limiter = RateLimiter(MemoryStore(), (10, 60), {})
+    assert all(limiter.hit("user:1", "Tickets", now=50.0)[0] for _ in range(10))
+
+    allowed, _, remaining, reset, _ = limiter.hit("user:1", "Tickets", now=61.0)
+    assert not allowed
+    assert remaining == 0
+    assert reset == 59
+
+    # Once most of the previous window has slid out, requests are allowed again
+    assert limiter.hit("user:1", "Tickets", now=115.0)[0]
@@ -0,0 +1,101 @@
+from sqlalchemy import event
+
+from db import db
+
+
+def test_list_etag_changes_when_a_ticket_is_edited_in_the_same_second(client, user_headers):
+    created = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2},
+        headers=user_headers,
+    ).json
+    listing = client.get("/ticket", headers=user_headers)
+    etag = listing.headers["ETag"]
+
+    client.put(f"/ticket/{created['id']}", json={"title": "Scanner"}, headers=user_headers)
+
+    response = client.get("/ticket", headers={**user_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json[0]["title"] == "Scanner"
+
+
+def test_list_etag_changes_when_a_user_is_edited(client, admin_headers):
+    etag = client.get("/user", headers=admin_headers).headers["ETag"]
+    client.put("/user/2", json={"username": "user@example.com", "fullname": "Renamed"}, headers=admin_headers)
+    response = client.get("/user", headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_unchanged_list_revalidates(client, user_headers):
+    etag = client.get("/ticket", headers=user_headers).headers["ETag"]
+    assert client.get("/ticket", headers={**user_headers, "If-None-Match": etag}).status_code == 304
+
+
+def test_list_etag_changes_when_a_ticket_is_deleted(client, admin_headers):
+    created = client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 1},
+        headers=admin_headers,
+    ).json
+    etag = client.get("/ticket", headers=admin_headers).headers["ETag"]
+    client.delete(f"/ticket/{created['id']}", headers=admin_headers)
+    response = client.get("/ticket", headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_revalidation_reads_change_counters_instead_of_aggregating_rows(app, client, user_headers):
+    etag = client.get("/ticket", headers=user_headers).headers["ETag"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lower())
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/ticket", headers={**user_headers, "If-None-Match": etag}).status_code == 304
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert any("table_changes" in statement for statement in statements)
+    assert not any("sum(" in statement or "count(" in statement for statement in statements)
+
+
+def create_ticket(client, headers):
+    return client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": "open", "priority": "low", "created_by": 2},
+        headers=headers,
+    ).json
+
+
+def test_compressed_representations_get_their_own_strong_etag(app, client, user_headers):
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    ticket = create_ticket(client, user_headers)
+
+    identity = client.get(f"/ticket/{ticket['id']}", headers=user_headers)
+    gzipped = client.get(f"/ticket/{ticket['id']}", headers={**user_headers, "Accept-Encoding": "gzip"})
+
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    identity_etag, identity_weak = identity.get_etag()
+    gzip_etag, gzip_weak = gzipped.get_etag()
+    assert not identity_weak and not gzip_weak
+    assert gzip_etag == f"{identity_etag}-gzip"
+
+
+def test_compressed_etag_revalidates_and_matches_if_match(app, client, user_headers):
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    ticket = create_ticket(client, user_headers)
+    gzip_headers = {**user_headers, "Accept-Encoding": "gzip"}
+    etag = client.get(f"/ticket/{ticket['id']}", headers=gzip_headers).headers["ETag"]
+
+    revalidated = client.get(f"/ticket/{ticket['id']}", headers={**gzip_headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+
+    if_match = {**user_headers, "If-Match": etag}
+    updated = client.put(f"/ticket/{ticket['id']}", json={"title": "Scanner"}, headers=if_match)
+    assert updated.status_code == 200
+    stale = client.put(f"/ticket/{ticket['id']}", json={"title": "Fax"}, headers=if_match)
+    assert stale.status_code == 412
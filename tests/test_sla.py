@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from db import db
+from models import ConfigMasterModel, EventModel, TicketModel
+from sla import escalate_breaches
+
+
+@pytest.fixture
+def policy(app):
+    with app.app_context():
+        db.session.add(ConfigMasterModel(type="sla", value="high", label="1"))
+        db.session.commit()
+
+
+def create_ticket(client, headers, priority="high", status="open"):
+    return client.post(
+        "/ticket",
+        json={"title": "Printer", "description": "Out of toner", "status": status, "priority": priority,
+              "created_by": 2},
+        headers=headers,
+    ).json
+
+
+def make_overdue(app, *ticket_ids):
+    with app.app_context():
+        db.session.execute(
+            update(TicketModel)
+            .where(TicketModel.id.in_(ticket_ids))
+            .values(escalate_at=datetime.utcnow() - timedelta(minutes=5))
+        )
+        db.session.commit()
+
+
+def sla_columns(app, ticket_id):
+    with app.app_context():
+        ticket = db.session.get(TicketModel, ticket_id)
+        return ticket.due_at, ticket.escalate_at, ticket.escalated_at
+
+
+def test_new_ticket_gets_a_deadline_from_its_policy(app, client, user_headers, policy):
+    with_policy = create_ticket(client, user_headers)
+    without_policy = create_ticket(client, user_headers, priority="low")
+
+    due_at, escalate_at, escalated_at = sla_columns(app, with_policy["id"])
+    assert due_at is not None and escalate_at == due_at and escalated_at is None
+    assert sla_columns(app, without_policy["id"]) == (None, None, None)
+
+
+def test_escalation_marks_overdue_tickets_and_clears_escalate_at(app, client, user_headers, policy):
+    overdue = create_ticket(client, user_headers)
+    on_time = create_ticket(client, user_headers)
+    make_overdue(app, overdue["id"])
+
+    assert escalate_breaches(app) == 1
+
+    _, escalate_at, escalated_at = sla_columns(app, overdue["id"])
+    assert escalate_at is None
+    assert escalated_at is not None
+    assert sla_columns(app, on_time["id"])[2] is None
+    # Cleared escalate_at drops the ticket from the next checks
+    assert escalate_breaches(app) == 0
+    with app.app_context():
+        payloads = db.session.execute(select(EventModel.payload)).scalars().all()
+    assert sum('"ticket.escalated"' in payload for payload in payloads) == 1
+
+
+def test_escalation_works_through_several_batches(app, client, user_headers, policy):
+    app.config["SLA_BATCH_SIZE"] = 2
+    ticket_ids = [create_ticket(client, user_headers)["id"] for _ in range(5)]
+    make_overdue(app, *ticket_ids)
+
+    assert escalate_breaches(app) == 5
+    for ticket_id in ticket_ids:
+        _, escalate_at, escalated_at = sla_columns(app, ticket_id)
+        assert escalate_at is None and escalated_at is not None
+
+
+def test_closed_tickets_are_not_escalated(app, client, user_headers, policy):
+    ticket = create_ticket(client, user_headers)
+    make_overdue(app, ticket["id"])
+    client.put(f"/ticket/{ticket['id']}", json={"status": "closed"}, headers=user_headers)
+
+    assert sla_columns(app, ticket["id"])[1] is None
+    assert escalate_breaches(app) == 0
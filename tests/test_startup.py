@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.startup import ROOT, measure
+
+# Libraries only some deployments or commands need; a worker must start without importing them
+DEFERRED_MODULES = ("alembic", "boto3", "pyarrow", "googleapiclient", "google.oauth2", "flask_mail")
+
+# Seconds a fresh interpreter may take to import app.py and create the app
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 2.0))
+
+
+def test_create_app_does_not_import_optional_integrations():
+    script = (
+        "import sys\n"
+        "from app import create_app\n"
+        "create_app('sqlite://')\n"
+        f"print([name for name in {DEFERRED_MODULES!r} if name in sys.modules])\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_startup_fits_the_budget():
+    # Best of three fresh interpreters, to ride out a busy machine
+    total = min(sum(measure()) for _ in range(3))
+    assert total < STARTUP_BUDGET_SECONDS, f"import app + create_app took {total:.2f}s"
@@ -1,9 +1,8 @@
-import os
-import json
-import base64
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from email.message import EmailMessage
+import logging
+
+from gmail import create_message, get_gmail_sender
+
+logger = logging.getLogger(__name__)
 
 
 def convert_to_enum(enum_class, value):
@@ -15,37 +14,21 @@ def convert_to_enum(enum_class, value):
     # Raise an error if no match found
     raise ValueError(f"Invalid value: {value}")
 
-def create_message(sender_email, to_email, subject, message_text):
-    """Create an email message."""
-    message = EmailMessage()
-    message.set_content(message_text)
-    message['To'] = to_email
-    message['From'] = sender_email
-    message['Subject'] = subject
-
-    # Encode the message to base64
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    return {'raw': raw_message}
-
 def send_email(sender_email, to_email, subject, message_text):
-    """Send an email using Gmail API and OAuth 2.0."""
-    # Create the email message
-    email_message = create_message(sender_email, to_email, subject, message_text)
-    print(to_email)
-    # Load credentials from the service account file
-    creds = service_account.Credentials.from_service_account_file(
-        'config/service_account.json',
-        scopes=['https://www.googleapis.com/auth/gmail.send']
-    )
-
-    delegated_creds = creds.with_subject(sender_email)
-
-    # Build the Gmail service
-    service = build('gmail', 'v1', credentials=delegated_creds)
-
+    """Send an email using Gmail API and OAuth 2.0; returns the Gmail message id, or None if it failed."""
     try:
-        # Send the email
-        service.users().messages().send(userId='me', body=email_message).execute()
-        print("Email sent successfully.")
+        message_id = get_gmail_sender().send(sender_email, to_email, subject, message_text)
+        logger.info(f"Email sent successfully to {to_email}.")
+        return message_id
     except Exception as e:
-        print(f"An error occurred while sending the email: {e}")
\ No newline at end of file
+        logger.error(f"An error occurred while sending the email to {to_email}: {e}")
+        return None
+
+
+def send_emails(messages):
+    """Send (sender, to, subject, text) tuples in Gmail batch requests; returns the message ids, None if failed."""
+    results = get_gmail_sender().send_many(messages)
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    if failed:
+        logger.error(f"{failed} of {len(results)} emails could not be sent.")
+    return [None if isinstance(result, Exception) else result for result in results]